@@ -1,13 +1,28 @@
 import streamlit as st
-import pandas as pd
-from datetime import datetime
-import os
-
-
-from pages import training, household_management, waste_collection
-from pages import worker_management, vehicle_tracking, treatment_plant
-from pages import community_reporting, rewards_fines
+import importlib
 from utils.database import init_database
+from utils.ai_jobs import get_job_queue
+
+# Page modules are imported only when their page is opened, so a new server process
+# does not load pandas, plotly, qrcode or the Gemini SDK before the first render.
+# Page key -> (sidebar label, module with a show() function)
+PAGES = {
+    "dashboard": ("🏠 Dashboard", None),
+    "training": ("📚 Training Management", "pages.training"),
+    "household": ("🏡 Household Management", "pages.household_management"),
+    "collection": ("🗑️ Waste Collection", "pages.waste_collection"),
+    "worker": ("👷 Worker Management", "pages.worker_management"),
+    "vehicle": ("🚛 Vehicle Tracking", "pages.vehicle_tracking"),
+    "treatment": ("🏭 Treatment Plant", "pages.treatment_plant"),
+    "community": ("📢 Community Reporting", "pages.community_reporting"),
+    "rewards": ("🎁 Rewards & Fines", "pages.rewards_fines")
+}
+
+def page_runner(module_name):
+    """Page callable that imports its module on first use; see utils/import_budget.py"""
+    def run():
+        importlib.import_module(module_name).show()
+    return run
 
 
 def main():
@@ -23,42 +38,28 @@ def main():
 
     init_database()
 
+    # Background AI verification workers, started once per server process
+    get_job_queue()
+
     st.sidebar.title("♻️ Waste Management System")
 
-    pages = {
-        "🏠 Dashboard": "dashboard",
-        "📚 Training Management": "training",
-        "🏡 Household Management": "household",
-        "🗑️ Waste Collection": "collection",
-        "👷 Worker Management": "worker",
-        "🚛 Vehicle Tracking": "vehicle",
-        "🏭 Treatment Plant": "treatment",
-        "📢 Community Reporting": "community",
-        "🎁 Rewards & Fines": "rewards"
-    }
-
-    selected_page = st.sidebar.radio("Navigate to:", list(pages.keys()))
-    page_key = pages[selected_page]
-
-  
-    if page_key == "dashboard":
-        show_dashboard()
-    elif page_key == "training":
-        training.show()
-    elif page_key == "household":
-        household_management.show()
-    elif page_key == "collection":
-        waste_collection.show()
-    elif page_key == "worker":
-        worker_management.show()
-    elif page_key == "vehicle":
-        vehicle_tracking.show()
-    elif page_key == "treatment":
-        treatment_plant.show()
-    elif page_key == "community":
-        community_reporting.show()
-    elif page_key == "rewards":
-        rewards_fines.show()
+    pages = {}
+    for page_key, (label, module_name) in PAGES.items():
+        pages[page_key] = st.Page(
+            show_dashboard if module_name is None else page_runner(module_name),
+            title=label,
+            url_path=page_key,
+            default=module_name is None
+        )
+
+    page = st.navigation(list(pages.values()))
+
+    # Quick actions on the dashboard ask for another page through session state
+    redirect_to = st.session_state.pop('redirect_to', None)
+    if redirect_to in pages:
+        st.switch_page(pages[redirect_to])
+
+    page.run()
 
 
 def show_dashboard():
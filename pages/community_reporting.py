@@ -4,26 +4,36 @@ from datetime import datetime, date
 import base64
 import json
 import random
-from utils.database import add_record, get_records, update_record
+from utils.database import add_record, get_records, update_record, Between
 from utils.ai_verification import analyze_community_report_image
+from utils.ai_jobs import enqueue_verification, save_report_analysis, verify_stored_photo, verify_pending_batch
+from utils.blob_store import save_uploads
+from utils.photo_gallery import paginate, photo_gallery
 
 
 def show():
     st.title("📢 Community Reporting System")
 
-    tab1, tab2, tab3, tab4 = st.tabs(["Submit Report", "Community Feed", "Report Validation", "Analytics"])
+    tab1, tab2, tab3, tab4 = st.tabs(
+        ["Submit Report", "Community Feed", "Report Validation", "Analytics"],
+        key="community_reporting_tab", on_change="rerun")
 
-    with tab1:
-        submit_report()
+    # Only the selected tab runs; the others render when they are opened
+    if tab1.open:
+        with tab1:
+            submit_report()
 
-    with tab2:
-        community_feed()
+    if tab2.open:
+        with tab2:
+            community_feed()
 
-    with tab3:
-        report_validation()
+    if tab3.open:
+        with tab3:
+            report_validation()
 
-    with tab4:
-        analytics()
+    if tab4.open:
+        with tab4:
+            analytics()
 
 
 def submit_report():
@@ -166,6 +176,8 @@ def submit_report():
                     "High - Urgent attention needed": "high"
                 }
 
+                photos = save_uploads([main_photo, additional_photo])
+
                 # Create report record
                 report_record = {
                     'reporter_name': reporter_name if not anonymous else 'Anonymous',
@@ -186,7 +198,8 @@ def submit_report():
                     'best_time_to_address': best_time_to_address,
                     'urgency_notes': urgency_notes,
                     'anonymous': anonymous,
-                    'photos_uploaded': 2 if additional_photo else 1,
+                    'photos_uploaded': len(photos),
+                    'photos': photos,
                     'status': 'submitted',
                     'upvotes': 0,
                     'downvotes': 0,
@@ -197,6 +210,9 @@ def submit_report():
 
                 record = add_record('community_reports', report_record)
 
+                # Analyzed in the background; results appear on the report when done
+                enqueue_verification('community_report', record['id'], photos[0])
+
                 st.success(f"✅ Report submitted successfully! Report ID: {record['id']}")
 
                 st.info("""
@@ -291,7 +307,7 @@ def community_feed():
             st.metric("Resolved Issues", resolved_reports)
 
     # Display reports
-    for report in filtered_reports:
+    for report in paginate(filtered_reports, "community_feed_page"):
         severity_colors = {
             'high': '🔴',
             'medium': '🟡',
@@ -340,6 +356,8 @@ def community_feed():
                 if report.get('latitude') and report.get('longitude'):
                     st.write(f"**GPS**: {report.get('latitude', 0):.4f}, {report.get('longitude', 0):.4f}")
 
+            photo_gallery(report.get('photos'), f"report_photos_{report.get('id')}")
+
             # Community interaction
             st.subheader("👥 Community Validation")
 
@@ -420,36 +438,30 @@ def report_validation():
         if pending_reports:
             st.write(f"**Pending AI Analysis**: {len(pending_reports)} reports")
 
+        in_background = verify_pending_batch('community_reports', pending_reports, analyze_community_report_image,
+                                             noun='reports')
+
+        if pending_reports:
             for report in pending_reports[:5]:  # Show first 5
                 with st.expander(f"📸 {report.get('issue_type', 'Unknown')} - {report.get('area', 'N/A')}"):
                     st.write(f"**Severity**: {report.get('severity', 'Unknown').title()}")
                     st.write(f"**Submitted**: {report.get('created_at', 'N/A')[:10]}")
                     st.write(f"**Photos**: {report.get('photos_uploaded', 0)}")
 
-                    if st.button(f"🤖 Run AI Analysis", key=f"ai_analyze_{report.get('id')}"):
+                    if report.get('id') in in_background:
+                        st.info("⏳ AI analysis is running in the background")
+                    elif st.button(f"🤖 Run AI Analysis", key=f"ai_analyze_{report.get('id')}"):
                         st.info("🤖 Analyzing photos...")
 
-                        # Simulate AI analysis (in real app, would process actual photos)
-                        ai_result = {
-                            'valid': True,
-                            'severity': report.get('severity'),
-                            'waste_type': 'Mixed Waste',
-                            'description': 'AI detected legitimate waste management issue requiring attention',
-                            'action_required': True,
-                            'confidence_score': 0.87
-                        }
-
-                        # In real implementation, would call:
-                        # ai_result = analyze_community_report_image(photo_base64)
-
-                        # Update record
-                        update_record('community_reports', report.get('id'), {
-                            'ai_analysis_pending': False,
-                            'ai_analysis_result': ai_result,
-                            'ai_validated': ai_result['valid'],
-                            'ai_confidence': ai_result.get('confidence_score', 0),
-                            'analysis_date': datetime.now().isoformat()
-                        })
+                        ai_result = verify_stored_photo(report, analyze_community_report_image)
+
+                        if ai_result.get('error'):
+                            st.error(f"❌ {ai_result['error']}")
+                            continue
+
+                        if not save_report_analysis(report, ai_result):
+                            st.info("This report was already analyzed")
+                            continue
 
                         if ai_result['valid']:
                             st.success("✅ AI Analysis: Valid waste issue detected")
@@ -548,14 +560,7 @@ def analytics():
         end_date = st.date_input("End Date", value=date.today())
 
     # Filter reports by date range
-    filtered_reports = []
-    for report in reports:
-        try:
-            report_date = datetime.strptime(report.get('created_at', '')[:10], '%Y-%m-%d').date()
-            if start_date <= report_date <= end_date:
-                filtered_reports.append(report)
-        except:
-            continue
+    filtered_reports = get_records('community_reports', {'created_at': Between.dates(start_date, end_date)})
 
     if not filtered_reports:
         st.warning("No data available for the selected date range.")
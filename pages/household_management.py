@@ -4,22 +4,28 @@ from datetime import datetime
 import json
 from utils.database import add_record, get_records, update_record
 from utils.qr_generator import create_household_qr, display_qr_code
+from utils.qr_sheets import qr_sheet_builder
 
 
 def show():
     st.title("🏡 Household Management System")
 
     tab1, tab2, tab3 = st.tabs(
-        ["Register Household", "Manage QR Codes", "Household Directory"])
+        ["Register Household", "Manage QR Codes", "Household Directory"],
+        key="household_management_tab", on_change="rerun")
 
-    with tab1:
-        register_household()
+    # Only the selected tab runs; the others render when they are opened
+    if tab1.open:
+        with tab1:
+            register_household()
 
-    with tab2:
-        manage_qr_codes()
+    if tab2.open:
+        with tab2:
+            manage_qr_codes()
 
-    with tab3:
-        household_directory()
+    if tab3.open:
+        with tab3:
+            household_directory()
 
 
 def register_household():
@@ -160,6 +166,9 @@ def manage_qr_codes():
         st.info("🏠 No registered households found. Register families first.")
         return
 
+    with st.expander("🖨️ Bulk QR Stickers"):
+        qr_sheet_builder('households', ["active", "inactive", "suspended"])
+
     # Search and filter
     col1, col2 = st.columns(2)
     with col1:
@@ -2,25 +2,33 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, date, timedelta
 import json
-from utils.database import add_record, get_records, update_record
+from utils.database import add_record, get_records, update_record, Between, In, Prefix
+from utils.blob_store import save_uploads
 
 
 def show():
     st.title("🎁 Rewards & Fines Management")
 
-    tab1, tab2, tab3, tab4 = st.tabs(["Rewards Dashboard", "Issue Fines", "Transaction History", "Analytics"])
+    tab1, tab2, tab3, tab4 = st.tabs(
+        ["Rewards Dashboard", "Issue Fines", "Transaction History", "Analytics"],
+        key="rewards_fines_tab", on_change="rerun")
 
-    with tab1:
-        rewards_dashboard()
+    # Only the selected tab runs; the others render when they are opened
+    if tab1.open:
+        with tab1:
+            rewards_dashboard()
 
-    with tab2:
-        issue_fines()
+    if tab2.open:
+        with tab2:
+            issue_fines()
 
-    with tab3:
-        transaction_history()
+    if tab3.open:
+        with tab3:
+            transaction_history()
 
-    with tab4:
-        analytics()
+    if tab4.open:
+        with tab4:
+            analytics()
 
 
 def rewards_dashboard():
@@ -124,10 +132,11 @@ def rewards_dashboard():
     # Recent rewards
     st.subheader("📋 Recent Rewards & Incentives")
 
-    recent_rewards = [r for r in rewards if r.get('type') in ['reward', 'incentive', 'community_reward', 'ai_bonus']]
-    recent_rewards.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+    recent_rewards = get_records('rewards_fines', {
+        'type': In(['reward', 'incentive', 'community_reward', 'ai_bonus'])
+    }, order_by='-created_at', limit=10)
 
-    for reward in recent_rewards[:10]:
+    for reward in recent_rewards:
         reward_icons = {
             'reward': '🎁',
             'incentive': '💰',
@@ -385,6 +394,8 @@ def issue_fines():
                 family_id = int(selected_family.split("ID: ")[1].split(")")[0])
                 family_name = selected_family.split(" - ")[0]
 
+                photos = save_uploads([evidence_photo])
+
                 # Create violation record
                 violation_record = {
                     'type': violation_type.lower(),
@@ -397,7 +408,8 @@ def issue_fines():
                     'detailed_description': detailed_description,
                     'inspector_name': inspector_name,
                     'inspector_id': inspector_id,
-                    'evidence_photo': evidence_photo is not None,
+                    'evidence_photo': bool(photos),
+                    'photos': photos,
                     'status': 'issued',
                     'payment_status': 'pending' if fine_amount > 0 else 'n/a',
                     'created_at': datetime.now().isoformat()
@@ -430,9 +442,11 @@ def issue_fines():
     # Recent violations
     st.subheader("📋 Recent Violations")
 
-    violations.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+    recent_violations = get_records('rewards_fines', {
+        'type': In(['fine', 'warning', 'penalty'])
+    }, order_by='-created_at', limit=10)
 
-    for violation in violations[:10]:
+    for violation in recent_violations:
         violation_icons = {
             'warning': '⚠️',
             'fine': '💰',
@@ -652,14 +666,7 @@ def analytics():
         end_date = st.date_input("End Date", value=date.today())
 
     # Filter by date range
-    filtered_transactions = []
-    for transaction in transactions:
-        try:
-            transaction_date = datetime.strptime(transaction.get('created_at', '')[:10], '%Y-%m-%d').date()
-            if start_date <= transaction_date <= end_date:
-                filtered_transactions.append(transaction)
-        except:
-            continue
+    filtered_transactions = get_records('rewards_fines', {'created_at': Between.dates(start_date, end_date)})
 
     if not filtered_transactions:
         st.warning("No data available for the selected date range.")
@@ -782,13 +789,16 @@ def analytics():
     previous_month = (datetime.now() - timedelta(days=30)).strftime('%Y-%m')
 
     current_rewards = len([r for r in rewards if r.get('created_at', '').startswith(current_month)])
-    previous_rewards = len([r for r in transactions if r.get('created_at', '').startswith(previous_month)
-                            and r.get('type') in ['reward', 'manual_reward', 'community_reward', 'incentive',
-                                                  'ai_bonus']])
+    previous_rewards = len(get_records('rewards_fines', {
+        'created_at': Prefix(previous_month),
+        'type': In(['reward', 'manual_reward', 'community_reward', 'incentive', 'ai_bonus'])
+    }))
 
     current_violations = len([v for v in violations if v.get('created_at', '').startswith(current_month)])
-    previous_violations = len([v for v in transactions if v.get('created_at', '').startswith(previous_month)
-                               and v.get('type') in ['fine', 'warning', 'penalty']])
+    previous_violations = len(get_records('rewards_fines', {
+        'created_at': Prefix(previous_month),
+        'type': In(['fine', 'warning', 'penalty'])
+    }))
 
     col1, col2 = st.columns(2)
 
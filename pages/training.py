@@ -7,16 +7,22 @@ from utils.database import add_record, get_records, update_record
 def show():
     st.title("📚 Training Management System")
 
-    tab1, tab2, tab3 = st.tabs(["Register Family Training", "Training Records", "Training Modules"])
-
-    with tab1:
-        register_family_training()
-
-    with tab2:
-        view_training_records()
-
-    with tab3:
-        training_modules()
+    tab1, tab2, tab3 = st.tabs(
+        ["Register Family Training", "Training Records", "Training Modules"],
+        key="training_tab", on_change="rerun")
+
+    # Only the selected tab runs; the others render when they are opened
+    if tab1.open:
+        with tab1:
+            register_family_training()
+
+    if tab2.open:
+        with tab2:
+            view_training_records()
+
+    if tab3.open:
+        with tab3:
+            training_modules()
 
 
 def register_family_training():
@@ -3,26 +3,37 @@ import pandas as pd
 from datetime import datetime, date
 import base64
 import json
-from utils.database import add_record, get_records, update_record
+from utils.database import add_record, get_records, update_record, batch_writes, Between
 from utils.ai_verification import verify_treatment_plant_delivery, verify_waste_segregation
+from utils.ai_jobs import (enqueue_verification, save_delivery_verification, verify_stored_photo,
+                           verify_pending_batch)
+from utils.blob_store import save_uploads
+from utils.photo_gallery import paginate, photo_gallery
 
 
 def show():
     st.title("🏭 Treatment Plant Management")
 
-    tab1, tab2, tab3, tab4 = st.tabs(["Waste Delivery", "AI Verification", "Plant Records", "Performance Analytics"])
+    tab1, tab2, tab3, tab4 = st.tabs(
+        ["Waste Delivery", "AI Verification", "Plant Records", "Performance Analytics"],
+        key="treatment_plant_tab", on_change="rerun")
 
-    with tab1:
-        waste_delivery()
+    # Only the selected tab runs; the others render when they are opened
+    if tab1.open:
+        with tab1:
+            waste_delivery()
 
-    with tab2:
-        ai_verification()
+    if tab2.open:
+        with tab2:
+            ai_verification()
 
-    with tab3:
-        plant_records()
+    if tab3.open:
+        with tab3:
+            plant_records()
 
-    with tab4:
-        performance_analytics()
+    if tab4.open:
+        with tab4:
+            performance_analytics()
 
 
 def waste_delivery():
@@ -146,6 +157,8 @@ def waste_delivery():
                     "Poor - Badly mixed": "poor"
                 }
 
+                photos = save_uploads([delivery_photo, segregation_photo])
+
                 # Create delivery record
                 delivery_record = {
                     'vehicle_id': vehicle['id'],
@@ -170,41 +183,47 @@ def waste_delivery():
                     'weight_verified': weight_verified,
                     'quality_checked': quality_checked,
                     'receipt_issued': receipt_issued,
-                    'photos_uploaded': 2,
+                    'photos_uploaded': len(photos),
+                    'photos': photos,
                     'ai_verification_pending': True,
                     'status': 'delivered',
                     'created_at': datetime.now().isoformat()
                 }
 
-                record = add_record('treatment_reports', delivery_record)
-
-                st.success(f"✅ Delivery registered successfully! Record ID: {record['id']}")
-
-                # Update vehicle status
-                update_record('vehicles', vehicle['id'], {
-                    'current_status': 'At Treatment Plant',
-                    'last_delivery': datetime.now().isoformat(),
-                    'total_collections': vehicle.get('total_collections', 0) + 1
-                })
-
-                # Determine worker incentives based on quality
-                if delivery_record['segregation_quality'] in ['excellent', 'good']:
-                    st.success("🎁 Driver eligible for performance incentive!")
-
-                    # Add reward for driver
-                    incentive_amount = 50 if delivery_record['segregation_quality'] == 'excellent' else 25
-                    add_record('rewards_fines', {
-                        'worker_name': vehicle.get('driver_name', ''),
-                        'vehicle_number': vehicle['vehicle_number'],
-                        'type': 'incentive',
-                        'reason': f'Quality waste delivery - {delivery_record["segregation_quality"]} segregation',
-                        'amount': incentive_amount,
-                        'treatment_record_id': record['id'],
-                        'created_at': datetime.now().isoformat()
+                # The delivery, vehicle update and incentive are flushed together
+                with batch_writes():
+                    record = add_record('treatment_reports', delivery_record)
+
+                    st.success(f"✅ Delivery registered successfully! Record ID: {record['id']}")
+
+                    # Update vehicle status
+                    update_record('vehicles', vehicle['id'], {
+                        'current_status': 'At Treatment Plant',
+                        'last_delivery': datetime.now().isoformat(),
+                        'total_collections': vehicle.get('total_collections', 0) + 1
                     })
 
-                elif delivery_record['segregation_quality'] == 'poor':
-                    st.warning("⚠️ Poor segregation quality - Driver training recommended")
+                    # Determine worker incentives based on quality
+                    if delivery_record['segregation_quality'] in ['excellent', 'good']:
+                        st.success("🎁 Driver eligible for performance incentive!")
+
+                        # Add reward for driver
+                        incentive_amount = 50 if delivery_record['segregation_quality'] == 'excellent' else 25
+                        add_record('rewards_fines', {
+                            'worker_name': vehicle.get('driver_name', ''),
+                            'vehicle_number': vehicle['vehicle_number'],
+                            'type': 'incentive',
+                            'reason': f'Quality waste delivery - {delivery_record["segregation_quality"]} segregation',
+                            'amount': incentive_amount,
+                            'treatment_record_id': record['id'],
+                            'created_at': datetime.now().isoformat()
+                        })
+
+                    elif delivery_record['segregation_quality'] == 'poor':
+                        st.warning("⚠️ Poor segregation quality - Driver training recommended")
+
+                # Verified in the background; results appear on the record when done
+                enqueue_verification('treatment_delivery', record['id'], photos[0])
 
                 st.info("🤖 Photos will be processed by AI for verification. Check AI Verification tab for results.")
                 st.rerun()
@@ -222,12 +241,16 @@ def ai_verification():
     # Get pending verifications
     pending_reports = get_records('treatment_reports', {'ai_verification_pending': True})
 
+    if pending_reports:
+        st.subheader(f"📋 Pending Verifications ({len(pending_reports)})")
+
+    in_background = verify_pending_batch('treatment_reports', pending_reports, verify_treatment_plant_delivery,
+                                         noun='deliveries')
+
     if not pending_reports:
         st.info("✅ No pending AI verifications. All deliveries have been processed.")
         return
 
-    st.subheader(f"📋 Pending Verifications ({len(pending_reports)})")
-
     for report in pending_reports:
         with st.expander(
                 f"🚛 {report.get('vehicle_number', 'Unknown')} - {report.get('delivery_date', 'N/A')} (ID: {report.get('id', 'N/A')})"):
@@ -246,49 +269,26 @@ def ai_verification():
                 st.write(f"**Received By**: {report.get('received_by', 'N/A')}")
                 st.write(f"**Photos Uploaded**: {report.get('photos_uploaded', 0)}")
 
-            # Simulate AI verification process
-            if st.button(f"🤖 Run AI Verification", key=f"verify_{report.get('id')}"):
+            if report.get('id') in in_background:
+                st.info("⏳ AI verification is running in the background")
+            elif st.button(f"🤖 Run AI Verification", key=f"verify_{report.get('id')}"):
                 st.info("🤖 Processing photos with AI...")
 
-                # Simulate AI verification (in real app, would process actual photos)
-                verification_result = {
-                    'verified': True,
-                    'segregation_quality': report.get('segregation_quality'),
-                    'vehicle_compliance': True,
-                    'notes': 'AI verification completed successfully. Photos show proper delivery procedures.',
-                    'confidence_score': 0.92,
-                    'detected_issues': [],
-                    'recommendations': ['Continue current quality standards']
-                }
+                verification_result = verify_stored_photo(report, verify_treatment_plant_delivery)
 
-                # In real implementation, would call:
-                # verification_result = verify_treatment_plant_delivery(photo_base64)
+                if verification_result.get('error'):
+                    st.error(f"❌ {verification_result['error']}")
+                    continue
 
-                # Update record with AI results
-                update_record('treatment_reports', report.get('id'), {
-                    'ai_verification_pending': False,
-                    'ai_verification_result': verification_result,
-                    'ai_verified': verification_result['verified'],
-                    'ai_confidence': verification_result.get('confidence_score', 0),
-                    'verification_date': datetime.now().isoformat()
-                })
+                if not save_delivery_verification(report, verification_result):
+                    st.info("This delivery was already verified")
+                    continue
 
                 if verification_result['verified']:
                     st.success("✅ AI Verification: Delivery verified successfully!")
 
-                    # Additional incentive for AI-verified quality delivery
                     if verification_result.get('confidence_score', 0) > 0.9:
                         st.success("🏆 High confidence AI verification - Additional bonus earned!")
-
-                        add_record('rewards_fines', {
-                            'worker_name': report.get('driver_name', ''),
-                            'vehicle_number': report.get('vehicle_number', ''),
-                            'type': 'ai_bonus',
-                            'reason': 'High-confidence AI verification of quality delivery',
-                            'amount': 15,
-                            'treatment_record_id': report.get('id'),
-                            'created_at': datetime.now().isoformat()
-                        })
                 else:
                     st.warning("⚠️ AI Verification: Issues detected - Manual review required")
 
@@ -413,7 +413,7 @@ def plant_records():
             st.metric("AI Verified", ai_verified)
 
     # Display detailed records
-    for report in filtered_reports:
+    for report in paginate(filtered_reports, "plant_records_page"):
         quality_colors = {
             'excellent': '🟢',
             'good': '🟡',
@@ -477,6 +477,8 @@ def plant_records():
             if report.get('delivery_notes'):
                 st.write(f"**Notes**: {report.get('delivery_notes')}")
 
+            photo_gallery(report.get('photos'), f"delivery_photos_{report.get('id')}")
+
 
 def performance_analytics():
     st.subheader("📊 Treatment Plant Performance Analytics")
@@ -495,14 +497,8 @@ def performance_analytics():
         end_date = st.date_input("End Date", value=date.today())
 
     # Filter reports by date range
-    filtered_reports = []
-    for report in reports:
-        try:
-            report_date = datetime.strptime(report.get('delivery_date', ''), '%Y-%m-%d').date()
-            if start_date <= report_date <= end_date:
-                filtered_reports.append(report)
-        except:
-            continue
+    filtered_reports = get_records('treatment_reports',
+                                   {'delivery_date': Between(str(start_date), str(end_date))})
 
     if not filtered_reports:
         st.warning("No data available for the selected date range.")
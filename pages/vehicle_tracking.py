@@ -11,19 +11,25 @@ def show():
     st.title("🚛 Vehicle Tracking System")
 
     tab1, tab2, tab3, tab4 = st.tabs(
-        ["Real-time Tracking", "Vehicle Management", "Route History", "Performance Analytics"])
+        ["Real-time Tracking", "Vehicle Management", "Route History", "Performance Analytics"],
+        key="vehicle_tracking_tab", on_change="rerun")
 
-    with tab1:
-        realtime_tracking()
+    # Only the selected tab runs; the others render when they are opened
+    if tab1.open:
+        with tab1:
+            realtime_tracking()
 
-    with tab2:
-        vehicle_management()
+    if tab2.open:
+        with tab2:
+            vehicle_management()
 
-    with tab3:
-        route_history()
+    if tab3.open:
+        with tab3:
+            route_history()
 
-    with tab4:
-        performance_analytics()
+    if tab4.open:
+        with tab4:
+            performance_analytics()
 
 
 def realtime_tracking():
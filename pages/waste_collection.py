@@ -2,22 +2,30 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, date
 import json
-from utils.database import add_record, get_records, update_record
+from utils.database import add_record, get_records, update_record, batch_writes
+from utils.blob_store import save_uploads
+from utils.qr_generator import parse_qr_data
 
 
 def show():
     st.title("🗑️ Waste Collection Management")
 
-    tab1, tab2, tab3 = st.tabs(["QR Scanning & Collection", "Collection Records", "Route Management"])
+    tab1, tab2, tab3 = st.tabs(
+        ["QR Scanning & Collection", "Collection Records", "Route Management"],
+        key="waste_collection_tab", on_change="rerun")
 
-    with tab1:
-        qr_scanning_collection()
+    # Only the selected tab runs; the others render when they are opened
+    if tab1.open:
+        with tab1:
+            qr_scanning_collection()
 
-    with tab2:
-        collection_records()
+    if tab2.open:
+        with tab2:
+            collection_records()
 
-    with tab3:
-        route_management()
+    if tab3.open:
+        with tab3:
+            route_management()
 
 
 def qr_scanning_collection():
@@ -51,10 +59,21 @@ def qr_scanning_collection():
                 st.warning("⚠️ No active families found for scanning simulation")
 
         else:  # Manual Entry
-            manual_family_id = st.text_input("Enter Family ID", placeholder="Enter family ID from QR code")
+            manual_family_id = st.text_input("Enter Family ID",
+                                             placeholder="Enter family ID or the text read from the QR code")
             if manual_family_id and st.button("🔍 Verify Family ID"):
-                st.session_state['scanned_family_id'] = manual_family_id
-                st.success(f"✅ Family ID Verified: {manual_family_id}")
+                manual_family_id = manual_family_id.strip()
+                if manual_family_id.isdigit():
+                    st.session_state['scanned_family_id'] = manual_family_id
+                    st.success(f"✅ Family ID Verified: {manual_family_id}")
+                else:
+                    # Signed QR codes are checked offline; the family is then found by id
+                    qr_data = parse_qr_data(manual_family_id)
+                    if qr_data.get('type') == 'household' and qr_data.get('verified'):
+                        st.session_state['scanned_family_id'] = qr_data['family_id']
+                        st.success(f"✅ QR Code Verified! Family ID: {qr_data['family_id']}")
+                    else:
+                        st.error(f"❌ Not a valid household QR code{': ' + qr_data['error'] if qr_data.get('error') else ''}")
 
     with col2:
         st.subheader("📝 Collection Update Form")
@@ -115,7 +134,6 @@ def qr_scanning_collection():
                     collection_notes = st.text_area("Collection Notes",
                                                     placeholder="Any additional observations or issues")
 
-                    # Photo upload simulation
                     st.subheader("📷 Collection Evidence")
                     uploaded_files = st.file_uploader("Upload Photos (Optional)",
                                                       accept_multiple_files=True,
@@ -132,6 +150,8 @@ def qr_scanning_collection():
                                 "Poor - Improperly segregated": "poor"
                             }
 
+                            photos = save_uploads(uploaded_files or [])
+
                             # Create collection record
                             collection_record = {
                                 'family_id': int(family_id),
@@ -151,41 +171,44 @@ def qr_scanning_collection():
                                 'missed_collection': missed_collection,
                                 'payment_required': payment_required,
                                 'collection_notes': collection_notes,
-                                'photos_uploaded': len(uploaded_files) if uploaded_files else 0,
+                                'photos_uploaded': len(photos),
+                                'photos': photos,
                                 'created_at': datetime.now().isoformat()
                             }
 
-                            record = add_record('collections', collection_record)
-
-                            st.success(f"✅ Collection updated successfully! Record ID: {record['id']}")
-
-                            # Clear the scanned family for next collection
-                            del st.session_state['scanned_family_id']
-
-                            # Show rewards/penalties based on segregation quality
-                            if collection_record['segregation_quality'] == 'good':
-                                st.success("🎁 Family eligible for reward points!")
-                                # Add reward
-                                add_record('rewards_fines', {
-                                    'family_id': int(family_id),
-                                    'type': 'reward',
-                                    'reason': 'Proper waste segregation',
-                                    'amount': 10,  # reward points
-                                    'collection_record_id': record['id'],
-                                    'created_at': datetime.now().isoformat()
-                                })
-
-                            elif collection_record['segregation_quality'] == 'poor':
-                                st.warning("⚠️ Poor segregation - Warning issued")
-                                # Add warning/fine
-                                add_record('rewards_fines', {
-                                    'family_id': int(family_id),
-                                    'type': 'warning',
-                                    'reason': 'Poor waste segregation',
-                                    'amount': 0,
-                                    'collection_record_id': record['id'],
-                                    'created_at': datetime.now().isoformat()
-                                })
+                            # The collection and its reward/warning are flushed together
+                            with batch_writes():
+                                record = add_record('collections', collection_record)
+
+                                st.success(f"✅ Collection updated successfully! Record ID: {record['id']}")
+
+                                # Clear the scanned family for next collection
+                                del st.session_state['scanned_family_id']
+
+                                # Show rewards/penalties based on segregation quality
+                                if collection_record['segregation_quality'] == 'good':
+                                    st.success("🎁 Family eligible for reward points!")
+                                    # Add reward
+                                    add_record('rewards_fines', {
+                                        'family_id': int(family_id),
+                                        'type': 'reward',
+                                        'reason': 'Proper waste segregation',
+                                        'amount': 10,  # reward points
+                                        'collection_record_id': record['id'],
+                                        'created_at': datetime.now().isoformat()
+                                    })
+
+                                elif collection_record['segregation_quality'] == 'poor':
+                                    st.warning("⚠️ Poor segregation - Warning issued")
+                                    # Add warning/fine
+                                    add_record('rewards_fines', {
+                                        'family_id': int(family_id),
+                                        'type': 'warning',
+                                        'reason': 'Poor waste segregation',
+                                        'amount': 0,
+                                        'collection_record_id': record['id'],
+                                        'created_at': datetime.now().isoformat()
+                                    })
 
                             st.rerun()
 
@@ -374,7 +397,8 @@ def route_management():
 
             # Recent routes
             st.subheader("📋 Recent Routes")
-            for route in routes[-5:]:  # Show last 5 routes
+            recent_routes = get_records('collection_routes', order_by='-created_at', limit=5)
+            for route in reversed(recent_routes):  # Show last 5 routes
                 status_icon = "📍" if route.get('status') == 'planned' else "✅"
                 st.write(f"{status_icon} **{route.get('route_name')}** - {route.get('families_count', 0)} families")
         else:
@@ -1,29 +1,36 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date
-import base64
 from utils.database import add_record, get_records, update_record
-from utils.ai_verification import verify_safety_kit_photo
+from utils.ai_jobs import enqueue_verification
+from utils.blob_store import save_uploads
 from utils.qr_generator import create_worker_qr, display_qr_code
+from utils.qr_sheets import qr_sheet_builder
 
 
 def show():
     st.title("👷 Worker Management System")
 
     tab1, tab2, tab3, tab4 = st.tabs(
-        ["Worker Registration", "Safety Kit Distribution", "Worker Records", "Training & Verification"])
+        ["Worker Registration", "Safety Kit Distribution", "Worker Records", "Training & Verification"],
+        key="worker_management_tab", on_change="rerun")
 
-    with tab1:
-        worker_registration()
+    # Only the selected tab runs; the others render when they are opened
+    if tab1.open:
+        with tab1:
+            worker_registration()
 
-    with tab2:
-        safety_kit_distribution()
+    if tab2.open:
+        with tab2:
+            safety_kit_distribution()
 
-    with tab3:
-        worker_records()
+    if tab3.open:
+        with tab3:
+            worker_records()
 
-    with tab4:
-        training_verification()
+    if tab4.open:
+        with tab4:
+            training_verification()
 
 
 def worker_registration():
@@ -208,13 +215,8 @@ def safety_kit_distribution():
 
                 if submitted:
                     if photo1 and distributor_name and any(safety_items.values()):
-                        # Convert photos to base64 for AI verification
                         try:
-                            photo1_b64 = base64.b64encode(photo1.read()).decode()
-
-                            # AI verification
-                            st.info("🤖 Verifying photos with AI...")
-                            verification_result = verify_safety_kit_photo(photo1_b64)
+                            photos = save_uploads([photo1, photo2])
 
                             # Create safety kit record
                             kit_record = {
@@ -225,10 +227,11 @@ def safety_kit_distribution():
                                 'distribution_date': str(distribution_date),
                                 'distributor_name': distributor_name,
                                 'verification_notes': verification_notes,
-                                'photos_uploaded': 2 if photo2 else 1,
-                                'ai_verification': verification_result,
-                                'verification_status': 'verified' if verification_result.get(
-                                    'verified') else 'needs_review',
+                                'photos_uploaded': len(photos),
+                                'photos': photos,
+                                'ai_verification': None,
+                                'ai_verification_pending': True,
+                                'verification_status': 'pending',
                                 'created_at': datetime.now().isoformat()
                             }
 
@@ -241,29 +244,11 @@ def safety_kit_distribution():
                                 'status': 'kit_distributed'
                             })
 
-                            st.success(f"✅ Safety kit distributed successfully! Record ID: {record['id']}")
-
-                            # Show AI verification results
-                            col1, col2 = st.columns(2)
-
-                            with col1:
-                                if verification_result.get('verified'):
-                                    st.success("🤖 AI Verification: ✅ Photos verified successfully")
-                                else:
-                                    st.warning("🤖 AI Verification: ⚠️ Photos need manual review")
+                            # Verified in the background; the result is saved on the kit record
+                            enqueue_verification('safety_kit', record['id'], photos[0])
 
-                            with col2:
-                                confidence = verification_result.get('confidence', 0)
-                                st.metric("AI Confidence", f"{confidence:.1%}")
-
-                            # Show detected items
-                            if verification_result.get('items_detected'):
-                                st.write("🔍 **AI Detected Items**:",
-                                         ', '.join(verification_result['items_detected']))
-
-                            if verification_result.get('concerns'):
-                                st.warning("⚠️ **AI Concerns**: " +
-                                           ', '.join(verification_result['concerns']))
+                            st.success(f"✅ Safety kit distributed successfully! Record ID: {record['id']}")
+                            st.info("🤖 Photos queued for AI verification")
 
                             st.rerun()
 
@@ -283,6 +268,9 @@ def worker_records():
         st.info("👷 No worker records found.")
         return
 
+    with st.expander("🖨️ Bulk Worker ID Cards"):
+        qr_sheet_builder('workers', ["registered", "kit_distributed", "training_completed", "active", "inactive"])
+
     # Filters
     col1, col2, col3, col4 = st.columns(4)
 
@@ -513,10 +501,10 @@ def training_verification():
     # Training records
     st.subheader("📋 Training Records")
 
-    training_records = get_records('worker_training', {})
+    training_records = get_records('worker_training', order_by='-created_at', limit=10)
 
     if training_records:
-        for record in training_records[-10:]:  # Show last 10 records
+        for record in reversed(training_records):  # Show last 10 records
             with st.expander(f"🎓 {record.get('worker_name', 'Unknown')} - Score: {record.get('assessment_score', 0)}%"):
                 col1, col2 = st.columns(2)
 
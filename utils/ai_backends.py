@@ -0,0 +1,178 @@
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+
+
+# Backends answer one verification request: a model name, a prompt and the photo
+# bytes, returning the model's raw text reply. GeminiBackend calls the Gemini API;
+# FakeBackend answers in-process with deterministic replies, simulated latency and
+# injected errors, so the verification path can be load-tested offline.
+
+
+class BackendError(Exception):
+    """A failed backend call; code is the HTTP status it stands for"""
+
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+
+
+class GeminiBackend:
+    """Gemini API backend with a shared, pooled HTTPS client"""
+
+    name = 'gemini'
+
+    def __init__(self, api_key, timeout=60, max_connections=10):
+        # The google-genai SDK is slow to import, so the client is created with
+        # the first call and then shared, keeping its connections alive
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import httpx
+                    from google import genai
+                    from google.genai import types
+
+                    self._client = genai.Client(
+                        api_key=self.api_key,
+                        http_options=types.HttpOptions(
+                            timeout=int(self.timeout * 1000),
+                            client_args={
+                                'limits': httpx.Limits(
+                                    max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections,
+                                    keepalive_expiry=300
+                                )
+                            }
+                        )
+                    )
+        return self._client
+
+    def generate_content(self, model, prompt, image):
+        from google.genai import types
+
+        response = self.client.models.generate_content(
+            model=model,
+            contents=[
+                types.Part.from_bytes(
+                    data=image,
+                    mime_type="image/jpeg",
+                ),
+                prompt
+            ],
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+            ),
+        )
+        return response.text
+
+
+# Values the fake picks from for each field of the verification schemas
+FAKE_SAFETY_ITEMS = ['gloves', 'mask', 'boots', 'reflective vest', 'apron', 'helmet']
+FAKE_WASTE_TYPES = ['Mixed Waste', 'Plastic Waste', 'Organic Waste', 'Construction Debris', 'E-Waste']
+FAKE_QUALITIES = ['good', 'average', 'poor']
+FAKE_SEVERITIES = ['low', 'medium', 'high']
+
+# Errors the fake injects, by HTTP status
+FAKE_ERRORS = [
+    (429, "Resource has been exhausted (e.g. check quota)"),
+    (500, "Internal error encountered"),
+    (503, "The model is overloaded. Please try again later"),
+]
+
+
+class FakeBackend:
+    """In-process stand-in for Gemini
+
+    Each reply is derived from a hash of the model, prompt and photo, so the same
+    request always gets the same answer. Latency is log-normal around latency_ms
+    (latency_sigma sets the spread) and a share error_rate of calls raise a
+    BackendError with a 429, 500 or 503 code. Smaller models (names containing
+    'flash' or 'lite') answer faster and less confidently.
+    """
+
+    name = 'fake'
+
+    def __init__(self, latency_ms=800, latency_sigma=0.5, error_rate=0.0, seed=0, prompts=None):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.prompts = prompts or {}
+        self.calls = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def task_for(self, prompt):
+        for task, task_prompt in self.prompts.items():
+            if task_prompt == prompt:
+                return task
+        return None
+
+    def generate_content(self, model, prompt, image):
+        small = 'flash' in model or 'lite' in model
+        with self._lock:
+            self.calls += 1
+            latency = self.latency_ms * math.exp(self._random.gauss(0, self.latency_sigma))
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+                code, message = self._random.choice(FAKE_ERRORS)
+
+        time.sleep(latency / 1000 * (0.4 if small else 1))
+        if failed:
+            raise BackendError(message, code)
+
+        seed = hashlib.sha256(f"{model}\n{prompt}\n".encode() + image).digest()
+        return json.dumps(self.result(self.task_for(prompt), random.Random(seed), small))
+
+    def result(self, task, rng, small=False):
+        """A reply in the schema of the task's prompt, drawn from rng"""
+        confidence = round(rng.uniform(0.55, 0.95) if small else rng.uniform(0.75, 0.99), 2)
+        verified = rng.random() < 0.85
+
+        if task == 'safety_kit':
+            return {
+                'verified': verified,
+                'confidence': confidence,
+                'items_detected': rng.sample(FAKE_SAFETY_ITEMS, rng.randint(1, 4)),
+                'concerns': [] if verified else ['Some safety equipment is not visible']
+            }
+        if task == 'segregation':
+            quality = rng.choice(FAKE_QUALITIES)
+            return {
+                'quality': quality,
+                'confidence': confidence,
+                'issues': [] if quality == 'good' else ['Recyclables mixed with organic waste'],
+                'recommendations': [] if quality == 'good' else ['Separate dry and wet waste at source']
+            }
+        if task == 'community_report':
+            return {
+                'valid': verified,
+                'severity': rng.choice(FAKE_SEVERITIES),
+                'waste_type': rng.choice(FAKE_WASTE_TYPES),
+                'description': 'Waste accumulation visible in a public area' if verified
+                else 'No waste management issue visible',
+                'action_required': verified,
+                'confidence_score': confidence
+            }
+        if task == 'treatment_delivery':
+            return {
+                'verified': verified,
+                'segregation_quality': rng.choice(FAKE_QUALITIES),
+                'vehicle_compliance': rng.random() < 0.9,
+                'notes': 'Delivery follows plant procedures' if verified
+                else 'Waste is not segregated as declared',
+                'confidence_score': confidence
+            }
+        return {'confidence': confidence}
@@ -0,0 +1,157 @@
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import utils.ai_verification as ai
+from utils.ai_backends import FakeBackend
+from utils.blob_store import BlobStore
+from utils.rate_limit import TokenBucket, CircuitBreaker
+
+# Offline benchmark of the AI verification path. Verifications go to the fake
+# backend, so throughput, retries, escalation and the background job queue can be
+# measured without calling Gemini.
+#
+#   python -m utils.ai_benchmark --requests 200 --latency-ms 800 --error-rate 0.1
+
+
+def photos(count, seed):
+    """Distinct stand-in photos; the fake only hashes them"""
+    return [f"benchmark-photo-{seed}-{number}".encode() for number in range(count)]
+
+
+def use_fake_backend(args):
+    """Send verifications to a fresh FakeBackend and reset the client-side limits"""
+    backend = FakeBackend(args.latency_ms, args.latency_sigma, args.error_rate, args.seed, ai.PROMPTS)
+    ai.set_backend(backend)
+    ai.AI_CACHE = False
+    ai.AI_RETRIES = args.retries
+    ai.AI_BACKOFF_BASE = args.backoff_base
+    ai.rate_limiter = TokenBucket(args.rate_limit, args.rate_burst)
+    ai.circuit_breaker = CircuitBreaker(ai.AI_BREAKER_THRESHOLD, ai.AI_BREAKER_RESET)
+    ai.routing_stats = ai.RoutingStats()
+    return backend
+
+
+def run_batch(args):
+    """Verify args.requests photos with verify_batch; returns the summary lines"""
+    backend = use_fake_backend(args)
+    latencies = []
+
+    def verify(photo):
+        started = time.perf_counter()
+        result = ai.run_verification(args.task, photo)
+        latencies.append(time.perf_counter() - started)
+        return result
+
+    pairs, elapsed = ai.verify_batch(photos(args.requests, args.seed), verify, max_workers=args.concurrency)
+    failed = [result for _, result in pairs if result.get('error')]
+    latencies.sort()
+    routing = ai.routing_summary()
+    return [
+        f"verify_batch: {args.requests} {args.task} verifications, {args.concurrency} at a time",
+        f"  elapsed {elapsed:.2f} s, {args.requests / elapsed:.1f} verifications/s",
+        f"  latency median {statistics.median(latencies) * 1000:.0f} ms, "
+        f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.0f} ms",
+        f"  backend calls {backend.calls}, injected errors {backend.errors}, failed verifications {len(failed)}",
+        f"  rate limit now {ai.rate_limiter.rate_per_minute:.0f}/min, breaker {ai.circuit_breaker.state}",
+    ] + [
+        f"  {model}: {tier['calls']} calls, median {tier['median_ms']:.0f} ms, p95 {tier['p95_ms']:.0f} ms"
+        for model, tier in routing['tiers'].items()
+    ] + [
+        f"  {task}: escalated {route['escalations']} of {route['calls']} ({route['escalation_rate']:.0%})"
+        for task, route in routing['tasks'].items()
+    ]
+
+
+def run_queue(args):
+    """Enqueue args.requests safety kit verifications and time the job queue draining them
+
+    Returns the summary lines and the number of calls that reached the backend.
+    """
+    import utils.ai_jobs as ai_jobs
+    from utils.benchmark import use_data_dir
+    from utils.database import add_record
+
+    backend = use_fake_backend(args)
+    ai_jobs.AI_JOB_RETRY_DELAY = args.retry_delay
+    ai_jobs.AI_JOB_POLL_INTERVAL = min(ai_jobs.AI_JOB_POLL_INTERVAL, args.retry_delay)
+    work_dir = tempfile.mkdtemp(prefix="ai_benchmark_")
+    try:
+        use_data_dir(os.path.join(work_dir, "data"), "json")
+        blobs = BlobStore(os.path.join(work_dir, "photos"))
+        queue = ai_jobs.JobQueue(os.path.join(work_dir, "ai_jobs.db"), blobs, args.concurrency)
+        # Kit records as the safety kit form writes them, awaiting their verification
+        kits = []
+        for number, photo in enumerate(photos(args.requests, args.seed)):
+            sha256, size = blobs.put(photo)
+            kits.append(add_record('safety_kits', {
+                'worker_name': f"Worker {number}",
+                'photos_uploaded': 1,
+                'photos': [{'sha256': sha256, 'name': f"kit_{number}.jpg", 'type': 'image/jpeg', 'size': size}],
+                'ai_verification': None,
+                'ai_verification_pending': True,
+                'verification_status': 'pending'
+            }))
+
+        started = time.perf_counter()
+        for kit in kits:
+            queue.enqueue('safety_kit', kit['id'], kit['photos'][0])
+        enqueued = time.perf_counter() - started
+        queue.start()
+
+        while True:
+            stats = queue.stats()
+            if not stats.get('queued') and not stats.get('running'):
+                break
+            time.sleep(0.1)
+        elapsed = time.perf_counter() - started
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    lines = [
+        f"job queue: {args.requests} safety_kit jobs, {args.concurrency} workers",
+        f"  enqueue {enqueued * 1000 / args.requests:.2f} ms/job, drained in {elapsed:.2f} s, "
+        f"{args.requests / elapsed:.1f} jobs/s",
+        f"  jobs done {stats.get('done', 0)}, skipped {stats.get('skipped', 0)}, failed {stats.get('failed', 0)}",
+        f"  backend calls {backend.calls}, injected errors {backend.errors}",
+    ]
+    return lines, backend.calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AI verification against the fake backend")
+    parser.add_argument("--requests", type=int, default=100, help="Verifications to run")
+    parser.add_argument("--task", default="safety_kit", choices=sorted(ai.PROMPTS))
+    parser.add_argument("--concurrency", type=int, default=ai.AI_CONCURRENCY,
+                        help="verify_batch threads and job queue workers")
+    parser.add_argument("--latency-ms", type=float, default=ai.AI_FAKE_LATENCY_MS, help="Median fake latency")
+    parser.add_argument("--latency-sigma", type=float, default=ai.AI_FAKE_LATENCY_SIGMA,
+                        help="Spread of the log-normal fake latency")
+    parser.add_argument("--error-rate", type=float, default=ai.AI_FAKE_ERROR_RATE,
+                        help="Share of fake calls that fail with 429/500/503")
+    parser.add_argument("--seed", type=int, default=ai.AI_FAKE_SEED)
+    parser.add_argument("--rate-limit", type=float, default=6000, help="Client-side requests per minute")
+    parser.add_argument("--rate-burst", type=int, default=50)
+    parser.add_argument("--retries", type=int, default=ai.AI_RETRIES)
+    parser.add_argument("--backoff-base", type=float, default=0.1, help="First retry delay in seconds")
+    parser.add_argument("--retry-delay", type=float, default=1.0, help="First job queue retry delay in seconds")
+    parser.add_argument("--no-queue", action="store_true", help="Skip the job queue benchmark")
+    args = parser.parse_args()
+
+    for line in run_batch(args):
+        print(line)
+    if not args.no_queue:
+        lines, backend_calls = run_queue(args)
+        for line in lines:
+            print(line)
+        if not backend_calls:
+            print("No job reached the backend, so the queue timing measures nothing")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
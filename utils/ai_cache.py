@@ -0,0 +1,183 @@
+import hashlib
+import json
+import threading
+import time
+from io import BytesIO
+
+from utils.storage import ThreadLocalConnection
+
+
+# Persistent cache of AI verification results, keyed by the image content and the
+# prompt that produced them. An exact byte match is found by SHA-256; a re-encoded or
+# resized copy of the same photo is found by its perceptual hash (dHash), and only
+# counts once a 16x16 grayscale copy of both images agrees pixel for pixel within
+# max_pixel_diff, since different photos of the same scene can share a dHash. Entries
+# expire after a TTL and the least recently used ones are evicted past max_entries.
+
+
+def image_sha256(image_bytes):
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def image_dhash(image_bytes, size=8):
+    """64-bit difference hash of an image as hex, or None if it cannot be decoded"""
+    try:
+        from PIL import Image
+
+        with Image.open(BytesIO(image_bytes)) as image:
+            image.draft('L', (size * 8, size * 8))
+            pixels = list(image.convert('L').resize((size + 1, size)).getdata())
+    except Exception:
+        return None
+
+    bits = 0
+    for row in range(size):
+        for column in range(size):
+            left = pixels[row * (size + 1) + column]
+            right = pixels[row * (size + 1) + column + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:0{size * size // 4}x}"
+
+
+def image_pixels(image_bytes, size=16):
+    """size x size grayscale pixels of an image as bytes, or None if it cannot be decoded"""
+    try:
+        from PIL import Image
+
+        with Image.open(BytesIO(image_bytes)) as image:
+            image.draft('L', (size * 8, size * 8))
+            return image.convert('L').resize((size, size)).tobytes()
+    except Exception:
+        return None
+
+
+def pixel_diff(pixels, other):
+    """Largest difference between corresponding pixels of two image_pixels results"""
+    return max(abs(a - b) for a, b in zip(pixels, other))
+
+
+def prompt_version(model, prompt):
+    """Short fingerprint of the model and prompt; changing either invalidates cached results"""
+    return hashlib.sha256(f"{model}\n{prompt}".encode()).hexdigest()[:16]
+
+
+class ResultCache(ThreadLocalConnection):
+    """SQLite-backed verification result cache with TTL and LRU eviction"""
+
+    def __init__(self, db_path, ttl=30 * 24 * 3600, max_entries=10000, max_pixel_diff=16):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_pixel_diff = max_pixel_diff
+        self.hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+        self._local = threading.local()
+        self._init_schema()
+
+    def _init_schema(self):
+        conn = self.connection()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ai_cache (
+                    task TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    phash TEXT,
+                    pixels BLOB,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (task, prompt_version, sha256)
+                )
+            """)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(ai_cache)")]
+            if 'pixels' not in columns:
+                # Older entries have no pixels and are only found by SHA-256
+                conn.execute("ALTER TABLE ai_cache ADD COLUMN pixels BLOB")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_cache_phash ON ai_cache (task, prompt_version, phash)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_cache_last_used ON ai_cache (last_used)")
+
+    def _count(self, hit):
+        with self._counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, task, version, image_bytes):
+        """Return the cached result for this image and prompt version, or None"""
+        sha256 = image_sha256(image_bytes)
+        now = time.time()
+        conn = self.connection()
+        row = conn.execute(
+            "SELECT sha256, result FROM ai_cache WHERE task = ? AND prompt_version = ? AND sha256 = ? "
+            "AND created_at > ?",
+            (task, version, sha256, now - self.ttl)
+        ).fetchone()
+
+        if row is None:
+            phash = image_dhash(image_bytes)
+            pixels = image_pixels(image_bytes) if phash is not None else None
+            if pixels is not None:
+                candidates = conn.execute(
+                    "SELECT sha256, result, pixels FROM ai_cache WHERE task = ? AND prompt_version = ? "
+                    "AND phash = ? AND pixels IS NOT NULL AND created_at > ? ORDER BY last_used DESC",
+                    (task, version, phash, now - self.ttl)
+                ).fetchall()
+                row = next((candidate for candidate in candidates
+                            if pixel_diff(pixels, candidate[2]) <= self.max_pixel_diff), None)
+
+        if row is None:
+            self._count(False)
+            return None
+
+        with conn:
+            conn.execute(
+                "UPDATE ai_cache SET last_used = ?, hits = hits + 1 "
+                "WHERE task = ? AND prompt_version = ? AND sha256 = ?",
+                (now, task, version, row[0])
+            )
+        self._count(True)
+        return json.loads(row[1])
+
+    def put(self, task, version, image_bytes, result):
+        """Store a result, then drop expired entries and evict past max_entries"""
+        now = time.time()
+        conn = self.connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ai_cache "
+                "(task, prompt_version, sha256, phash, pixels, result, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (task, version, image_sha256(image_bytes), image_dhash(image_bytes), image_pixels(image_bytes),
+                 json.dumps(result, default=str), now, now)
+            )
+            conn.execute("DELETE FROM ai_cache WHERE created_at <= ?", (now - self.ttl,))
+            (entries,) = conn.execute("SELECT COUNT(*) FROM ai_cache").fetchone()
+            if entries > self.max_entries:
+                conn.execute(
+                    "DELETE FROM ai_cache WHERE rowid IN "
+                    "(SELECT rowid FROM ai_cache ORDER BY last_used LIMIT ?)",
+                    (entries - self.max_entries,)
+                )
+
+    def clear(self):
+        conn = self.connection()
+        with conn:
+            conn.execute("DELETE FROM ai_cache")
+
+    def stats(self):
+        """Hit and miss counts for this process, plus what the cache holds"""
+        entries, stored_hits = self.connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM ai_cache"
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries,
+            'lifetime_hits': stored_hits,
+        }
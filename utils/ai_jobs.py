@@ -0,0 +1,348 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import streamlit as st
+
+from utils.blob_store import get_blob_store
+from utils.storage import ThreadLocalConnection
+from utils.database import add_record, update_record, get_records, batch_writes
+from utils.ai_verification import (verify_safety_kit_photo, verify_treatment_plant_delivery,
+                                   analyze_community_report_image, verify_batch)
+
+# Background AI verification. Form submits store the photo in the blob store and
+# enqueue a job referencing it; a pool
+# of worker threads in the server process runs the verification and writes the
+# result back to the record. Jobs live in SQLite, so they survive restarts, and a
+# failed job is retried with exponential backoff up to AI_JOB_MAX_ATTEMPTS times.
+AI_JOB_DB = os.environ.get("AI_JOB_DB", os.path.join("data", "ai_jobs.db"))
+AI_JOB_WORKERS = int(os.environ.get("AI_JOB_WORKERS", "2"))
+AI_JOB_MAX_ATTEMPTS = int(os.environ.get("AI_JOB_MAX_ATTEMPTS", "5"))
+
+# Delay before the first retry in seconds; doubled for every further attempt
+AI_JOB_RETRY_DELAY = float(os.environ.get("AI_JOB_RETRY_DELAY", "30"))
+
+# How often idle workers look for jobs that became due, in seconds
+AI_JOB_POLL_INTERVAL = 5
+
+# Held while a result is checked against and written to its record
+_save_lock = threading.Lock()
+
+
+def _save_if_pending(table_name, record_id, pending_field, updates):
+    """Write AI results to a record only while pending_field is still set; returns whether it was written
+
+    A background job and a manual or batch run can verify the same record; only
+    the first result is kept.
+    """
+    with _save_lock:
+        records = get_records(table_name, {'id': record_id})
+        if not records or not records[0].get(pending_field):
+            return False
+        update_record(table_name, record_id, dict(updates, **{pending_field: False}))
+        return True
+
+
+def save_safety_kit_verification(kit, verification_result):
+    """Record AI results on a safety kit distribution; False if it was already verified"""
+    return _save_if_pending('safety_kits', kit.get('id'), 'ai_verification_pending', {
+        'ai_verification': verification_result,
+        'verification_status': 'verified' if verification_result.get('verified') else 'needs_review'
+    })
+
+
+def save_delivery_verification(report, verification_result):
+    """Record AI results on a delivery report and add the high-confidence bonus; False if it was already verified"""
+    saved = _save_if_pending('treatment_reports', report.get('id'), 'ai_verification_pending', {
+        'ai_verification_result': verification_result,
+        'ai_verified': verification_result['verified'],
+        'ai_confidence': verification_result.get('confidence_score', 0),
+        'verification_date': datetime.now().isoformat()
+    })
+    if not saved:
+        return False
+
+    # Additional incentive for AI-verified quality delivery
+    if verification_result['verified'] and verification_result.get('confidence_score', 0) > 0.9:
+        add_record('rewards_fines', {
+            'worker_name': report.get('driver_name', ''),
+            'vehicle_number': report.get('vehicle_number', ''),
+            'type': 'ai_bonus',
+            'reason': 'High-confidence AI verification of quality delivery',
+            'amount': 15,
+            'treatment_record_id': report.get('id'),
+            'created_at': datetime.now().isoformat()
+        })
+    return True
+
+
+def save_report_analysis(report, ai_result):
+    """Record AI analysis results on a community report; False if it was already analyzed"""
+    return _save_if_pending('community_reports', report.get('id'), 'ai_analysis_pending', {
+        'ai_analysis_result': ai_result,
+        'ai_validated': ai_result['valid'],
+        'ai_confidence': ai_result.get('confidence_score', 0),
+        'analysis_date': datetime.now().isoformat()
+    })
+
+
+# Job task -> (table the record is in, field set while its result is awaited,
+#              verify function, function saving its result)
+TASKS = {
+    'safety_kit': ('safety_kits', 'ai_verification_pending', verify_safety_kit_photo,
+                   save_safety_kit_verification),
+    'treatment_delivery': ('treatment_reports', 'ai_verification_pending', verify_treatment_plant_delivery,
+                           save_delivery_verification),
+    'community_report': ('community_reports', 'ai_analysis_pending', analyze_community_report_image,
+                         save_report_analysis),
+}
+
+
+class JobQueue(ThreadLocalConnection):
+    """Durable AI verification jobs and the worker threads that run them"""
+
+    def __init__(self, db_path, blobs, workers=2):
+        self.db_path = db_path
+        self.blobs = blobs
+        self.workers = workers
+        self.threads = []
+        self.wake = threading.Event()
+        self._local = threading.local()
+        self._start_lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._init_schema()
+
+    def _init_schema(self):
+        conn = self.connection()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ai_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    task TEXT NOT NULL,
+                    record_id INTEGER NOT NULL,
+                    photo TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    run_after REAL NOT NULL,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_jobs_due ON ai_jobs (status, run_after)")
+            # Jobs that were running when the previous process stopped start over
+            conn.execute("UPDATE ai_jobs SET status = 'queued' WHERE status = 'running'")
+
+    def enqueue(self, task, record_id, photo):
+        """Queue verification of a photo for a record; returns the job id
+
+        photo is a blob store reference or SHA-256; raw bytes are stored first.
+        """
+        if task not in TASKS:
+            raise ValueError(f"Unknown AI verification task: {task}")
+
+        if isinstance(photo, dict):
+            photo = photo['sha256']
+        elif isinstance(photo, (bytes, bytearray)):
+            photo, _ = self.blobs.put(photo)
+
+        now = datetime.now().isoformat()
+        conn = self.connection()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO ai_jobs (task, record_id, photo, status, run_after, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (task, record_id, photo, time.time(), now, now)
+            )
+        self.wake.set()
+        return cursor.lastrowid
+
+    def claim(self):
+        """Mark the oldest due job as running and return it, or None"""
+        conn = self.connection()
+        with conn:
+            row = conn.execute(
+                "UPDATE ai_jobs SET status = 'running', attempts = attempts + 1, updated_at = ? "
+                "WHERE id = (SELECT id FROM ai_jobs WHERE status = 'queued' AND run_after <= ? "
+                "ORDER BY run_after, id LIMIT 1) "
+                "RETURNING id, task, record_id, photo, attempts",
+                (datetime.now().isoformat(), time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(['id', 'task', 'record_id', 'photo', 'attempts'], row))
+
+    def finish(self, job, status, error=None, run_after=None, refund_attempt=False):
+        conn = self.connection()
+        with conn:
+            conn.execute(
+                "UPDATE ai_jobs SET status = ?, error = ?, run_after = COALESCE(?, run_after), "
+                "attempts = attempts - ?, updated_at = ? WHERE id = ?",
+                (status, error, run_after, 1 if refund_attempt else 0, datetime.now().isoformat(), job['id'])
+            )
+
+    def process(self, job):
+        """Run one job: verify its photo and save the result, or schedule a retry
+
+        A record that is no longer pending, because a manual or batch run already
+        verified it, is skipped without calling the AI service.
+        """
+        table_name, pending_field, verify, save_result = TASKS[job['task']]
+        try:
+            records = get_records(table_name, {'id': job['record_id']})
+            if not records:
+                self.finish(job, 'failed', f"{table_name} record {job['record_id']} not found")
+                return
+            if not records[0].get(pending_field):
+                self.finish(job, 'skipped', "Already verified")
+                return
+
+            result = verify(self.blobs.read(job['photo']))
+
+            if result.get('error') and job['attempts'] < AI_JOB_MAX_ATTEMPTS and \
+                    result.get('retry_after') is not None:
+                # The API is unhealthy or over quota: wait it out without using up an attempt
+                self.finish(job, 'queued', result['error'], time.time() + result['retry_after'],
+                            refund_attempt=True)
+                return
+            if result.get('error'):
+                raise RuntimeError(result['error'])
+
+            if save_result(records[0], result):
+                self.finish(job, 'done')
+            else:
+                self.finish(job, 'skipped', "Already verified")
+
+        except Exception as e:
+            if job['attempts'] >= AI_JOB_MAX_ATTEMPTS:
+                self.finish(job, 'failed', str(e))
+                update_record(table_name, job['record_id'], {'ai_job_error': str(e)})
+            else:
+                delay = AI_JOB_RETRY_DELAY * 2 ** (job['attempts'] - 1)
+                self.finish(job, 'queued', str(e), time.time() + delay)
+
+    def _run(self):
+        while True:
+            job = self.claim()
+            if job is None:
+                self.wake.wait(AI_JOB_POLL_INTERVAL)
+                self.wake.clear()
+                continue
+            self.process(job)
+
+    def start(self):
+        """Start the worker threads, once"""
+        with self._start_lock:
+            if self.threads:
+                return
+            for number in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"ai-job-worker-{number}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def live_record_ids(self, task):
+        """Ids of records that have a queued or running job for task"""
+        rows = self.connection().execute(
+            "SELECT DISTINCT record_id FROM ai_jobs WHERE task = ? AND status IN ('queued', 'running')",
+            (task,)
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def stats(self):
+        """Number of jobs in each status"""
+        rows = self.connection().execute("SELECT status, COUNT(*) FROM ai_jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Return the process-wide job queue with its workers running"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                queue = JobQueue(AI_JOB_DB, get_blob_store(), AI_JOB_WORKERS)
+                queue.start()
+                _queue = queue
+    return _queue
+
+
+def enqueue_verification(task, record_id, photo):
+    """Queue AI verification of a stored photo for a record; returns at once with the job id"""
+    return get_job_queue().enqueue(task, record_id, photo)
+
+
+def live_job_record_ids(task):
+    """Ids of records whose verification for task is queued or running in the background"""
+    return get_job_queue().live_record_ids(task)
+
+
+def verify_stored_photo(record, verify, photo_field='photos'):
+    """Run verify on the first stored photo in record[photo_field]
+
+    A record without one gets an error result, so it stays pending.
+    """
+    photos = record.get(photo_field)
+    blobs = get_blob_store()
+    if not photos or not blobs.exists(photos[0]['sha256']):
+        return {"error": "No stored photo to verify"}
+    return verify(blobs.read(photos[0]['sha256']))
+
+
+def verify_pending_batch(table_name, records, verify, photo_field='photos', noun='records'):
+    """Streamlit block that verifies every pending record of a table in one batch
+
+    Records with a queued or running background job are left to it, and only
+    records with a stored photo are sent to the AI service. Shows the summary of
+    the previous run, and returns the ids of the records verified in the
+    background so per-record buttons can skip them too.
+    """
+    task = next(task for task, spec in TASKS.items() if spec[0] == table_name)
+    save_result = TASKS[task][3]
+
+    # Summary of the last run, kept across its rerun
+    summary_key = f"{table_name}_batch_summary"
+    batch_summary = st.session_state.pop(summary_key, None)
+    if batch_summary:
+        st.success(batch_summary)
+
+    in_background = live_job_record_ids(task) if records else set()
+    verifiable = [r for r in records if r.get(photo_field) and r.get('id') not in in_background]
+    background_count = len([r for r in records if r.get('id') in in_background])
+    if background_count:
+        st.caption(f"⏳ {background_count} {noun} are being verified in the background")
+    no_photo_count = len([r for r in records if not r.get(photo_field)])
+    if no_photo_count:
+        st.caption(f"{no_photo_count} pending {noun} have no stored photo and need manual review")
+
+    if verifiable and st.button(f"🤖 Verify All Pending ({len(verifiable)})", key=f"verify_all_{table_name}"):
+        progress = st.progress(0.0, text="🤖 Processing photos with AI...")
+        results, elapsed = verify_batch(
+            verifiable, lambda record: verify_stored_photo(record, verify, photo_field),
+            on_progress=lambda done, total: progress.progress(done / total, text=f"🤖 Verified {done} of {total}")
+        )
+
+        # All results are written back in one flush
+        failed = 0
+        verified = 0
+        with batch_writes():
+            for record, result in results:
+                if result.get('error'):
+                    failed += 1
+                    continue
+                if save_result(record, result):
+                    verified += 1
+
+        summary = f"✅ Verified {verified} {noun} in {elapsed:.1f}s ({verified / max(elapsed, 0.001):.1f}/s)"
+        if failed:
+            summary += f" - {failed} failed and remain pending"
+        st.session_state[summary_key] = summary
+        st.rerun()
+
+    return in_background
@@ -1,153 +1,414 @@
 import os
 import json
 import base64
-from google import genai
-from google.genai import types
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.ai_backends import GeminiBackend, FakeBackend
+from utils.ai_cache import ResultCache, prompt_version
+from utils.image_processing import prepare_image
+from utils.rate_limit import TokenBucket, CircuitBreaker, backoff_delay
 
 # Using Gemini API for AI verification
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
-client = genai.Client(api_key=GEMINI_API_KEY) if GEMINI_API_KEY else None
-
-
-def verify_safety_kit_photo(base64_image):
-    """Verify safety kit distribution using AI"""
-    if not client:
-        return {"verified": False, "error": "Gemini API key not configured"}
-
-    try:
-        prompt = """You are a safety compliance expert. Analyze this image to verify if it shows a waste worker receiving safety equipment (gloves, masks, protective clothing, etc.). 
+GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.5-pro")
+
+# Tiered routing: every verification runs on the fast model first and is escalated
+# to GEMINI_MODEL only when the reply is malformed or its confidence falls below
+# AI_ESCALATION_THRESHOLD. Set GEMINI_FAST_MODEL to "" to always use GEMINI_MODEL.
+GEMINI_FAST_MODEL = os.environ.get("GEMINI_FAST_MODEL", "gemini-2.5-flash")
+AI_ESCALATION_THRESHOLD = float(os.environ.get("AI_ESCALATION_THRESHOLD", "0.75"))
+
+# Where verifications are sent: "gemini" for the Gemini API, or "fake" for an
+# in-process stand-in with deterministic replies, for offline load tests
+AI_BACKEND = os.environ.get("AI_BACKEND", "gemini")
+AI_FAKE_LATENCY_MS = float(os.environ.get("AI_FAKE_LATENCY_MS", "800"))
+AI_FAKE_LATENCY_SIGMA = float(os.environ.get("AI_FAKE_LATENCY_SIGMA", "0.5"))
+AI_FAKE_ERROR_RATE = float(os.environ.get("AI_FAKE_ERROR_RATE", "0"))
+AI_FAKE_SEED = int(os.environ.get("AI_FAKE_SEED", "0"))
+
+# Per-request timeout in seconds, and the size of the keep-alive connection pool
+AI_TIMEOUT = float(os.environ.get("AI_TIMEOUT", "60"))
+AI_MAX_CONNECTIONS = int(os.environ.get("AI_MAX_CONNECTIONS", "10"))
+
+# Verifications run at once by verify_batch
+AI_CONCURRENCY = int(os.environ.get("AI_CONCURRENCY", "8"))
+
+# Client-side quota: requests per minute and burst size. The rate halves on quota
+# errors and climbs back as calls succeed.
+AI_RATE_LIMIT = float(os.environ.get("AI_RATE_LIMIT", "60"))
+AI_RATE_BURST = int(os.environ.get("AI_RATE_BURST", "5"))
+
+# Retries of rate-limit, server and network errors, with jittered exponential backoff
+AI_RETRIES = int(os.environ.get("AI_RETRIES", "3"))
+AI_BACKOFF_BASE = float(os.environ.get("AI_BACKOFF_BASE", "1"))
+AI_BACKOFF_MAX = float(os.environ.get("AI_BACKOFF_MAX", "30"))
+
+# After this many consecutive failed calls, fail fast for AI_BREAKER_RESET seconds
+AI_BREAKER_THRESHOLD = int(os.environ.get("AI_BREAKER_THRESHOLD", "5"))
+AI_BREAKER_RESET = float(os.environ.get("AI_BREAKER_RESET", "60"))
+
+# HTTP statuses worth retrying
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Result cache: repeat submissions of the same photo (byte-identical or a re-encoded
+# copy) with the same model and prompt are answered without calling Gemini.
+AI_CACHE = os.environ.get("AI_CACHE", "1") == "1"
+AI_CACHE_PATH = os.environ.get("AI_CACHE_PATH", os.path.join("data", "ai_cache.db"))
+AI_CACHE_TTL = float(os.environ.get("AI_CACHE_TTL", str(30 * 24 * 3600)))
+AI_CACHE_MAX_ENTRIES = int(os.environ.get("AI_CACHE_MAX_ENTRIES", "10000"))
+# Largest grayscale pixel difference (0-255) at which a photo with the same dHash counts as a copy
+AI_CACHE_MAX_PIXEL_DIFF = int(os.environ.get("AI_CACHE_MAX_PIXEL_DIFF", "16"))
+
+# Prompt for each verification task
+PROMPTS = {
+    'safety_kit': """You are a safety compliance expert. Analyze this image to verify if it shows a waste worker receiving safety equipment (gloves, masks, protective clothing, etc.). 
 
 Respond with JSON format: {'verified': boolean, 'confidence': float, 'items_detected': list, 'concerns': list}
 
-Please verify if this image shows proper safety kit distribution to a waste worker. Check for safety equipment and proper handling."""
-
-        response = client.models.generate_content(
-            model="gemini-2.5-pro",
-            contents=[
-                types.Part.from_bytes(
-                    data=base64.b64decode(base64_image),
-                    mime_type="image/jpeg",
-                ),
-                prompt
-            ],
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-            ),
-        )
-
-        if response.text:
-            result = json.loads(response.text)
-            return result
-        else:
-            return {"verified": False, "error": "Empty response from Gemini"}
-
-    except Exception as e:
-        return {"verified": False, "error": f"AI verification failed: {str(e)}"}
+Please verify if this image shows proper safety kit distribution to a waste worker. Check for safety equipment and proper handling.""",
 
+    'segregation': """You are a waste management expert. Analyze this image to assess waste segregation quality. Check if organic, recyclable, and non-recyclable waste are properly separated. 
 
-def verify_waste_segregation(base64_image):
-    """Verify waste segregation quality using AI"""
-    if not client:
-        return {"quality": "unknown", "error": "Gemini API key not configured"}
+Respond with JSON format: {'quality': 'good'|'poor'|'average', 'confidence': float, 'issues': list, 'recommendations': list}
 
-    try:
-        prompt = """You are a waste management expert. Analyze this image to assess waste segregation quality. Check if organic, recyclable, and non-recyclable waste are properly separated. 
+Please assess the waste segregation quality in this image. Look for proper separation of different waste types.""",
 
-Respond with JSON format: {'quality': 'good'|'poor'|'average', 'confidence': float, 'issues': list, 'recommendations': list}
+    'community_report': """You are an environmental compliance officer. Analyze this image to determine if it shows legitimate waste management issues that require attention. 
 
-Please assess the waste segregation quality in this image. Look for proper separation of different waste types."""
-
-        response = client.models.generate_content(
-            model="gemini-2.5-pro",
-            contents=[
-                types.Part.from_bytes(
-                    data=base64.b64decode(base64_image),
-                    mime_type="image/jpeg",
-                ),
-                prompt
-            ],
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-            ),
-        )
-
-        if response.text:
-            result = json.loads(response.text)
-            return result
-        else:
-            return {"quality": "unknown", "error": "Empty response from Gemini"}
+Respond with JSON format: {'valid': boolean, 'severity': 'low'|'medium'|'high', 'waste_type': string, 'description': string, 'action_required': boolean}
 
-    except Exception as e:
-        return {"quality": "unknown", "error": f"AI verification failed: {str(e)}"}
+Please analyze this community-reported waste image and determine if it represents a valid environmental concern.""",
 
+    'treatment_delivery': """You are a waste treatment facility inspector. Analyze this image to verify proper waste delivery and segregation at the treatment plant. 
 
-def analyze_community_report_image(base64_image):
-    """Analyze community reported waste images"""
-    if not client:
-        return {"valid": False, "error": "Gemini API key not configured"}
+Respond with JSON format: {'verified': boolean, 'segregation_quality': 'good'|'poor'|'average', 'vehicle_compliance': boolean, 'notes': string}
 
+Please verify this waste delivery at the treatment plant. Check for proper segregation and compliance."""
+}
+
+# Result returned for each task when verification cannot run, plus an 'error' message
+FAILURE_RESULTS = {
+    'safety_kit': {"verified": False},
+    'segregation': {"quality": "unknown"},
+    'community_report': {"valid": False},
+    'treatment_delivery': {"verified": False},
+}
+
+# The backend is created with the first verification and then shared
+_backend = None
+_backend_lock = threading.Lock()
+_cache = None
+
+rate_limiter = TokenBucket(AI_RATE_LIMIT, AI_RATE_BURST)
+circuit_breaker = CircuitBreaker(AI_BREAKER_THRESHOLD, AI_BREAKER_RESET)
+
+
+class RoutingStats:
+    """Latency per model tier and escalation rate per task, for this process"""
+
+    def __init__(self, samples=1000):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.samples = samples
+        self.calls = {}
+        self.escalations = {}
+
+    def record_call(self, model, seconds):
+        with self.lock:
+            self.latencies.setdefault(model, deque(maxlen=self.samples)).append(seconds)
+
+    def record_verification(self, task, escalated):
+        with self.lock:
+            self.calls[task] = self.calls.get(task, 0) + 1
+            if escalated:
+                self.escalations[task] = self.escalations.get(task, 0) + 1
+
+    def summary(self):
+        with self.lock:
+            tiers = {}
+            for model, latencies in self.latencies.items():
+                ordered = sorted(latencies)
+                tiers[model] = {
+                    'calls': len(ordered),
+                    'median_ms': ordered[len(ordered) // 2] * 1000,
+                    'p95_ms': ordered[int(len(ordered) * 0.95)] * 1000
+                }
+            tasks = {
+                task: {
+                    'calls': calls,
+                    'escalations': self.escalations.get(task, 0),
+                    'escalation_rate': self.escalations.get(task, 0) / calls
+                }
+                for task, calls in self.calls.items()
+            }
+            return {'tiers': tiers, 'tasks': tasks}
+
+
+routing_stats = RoutingStats()
+
+
+class AIUnavailable(Exception):
+    """Gemini is not being called right now; try again after retry_after seconds"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def get_backend():
+    """Return the shared backend selected by AI_BACKEND; None for Gemini without an API key"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if AI_BACKEND == "fake":
+                    _backend = FakeBackend(AI_FAKE_LATENCY_MS, AI_FAKE_LATENCY_SIGMA, AI_FAKE_ERROR_RATE,
+                                           AI_FAKE_SEED, PROMPTS)
+                elif AI_BACKEND != "gemini":
+                    raise ValueError(f"Unknown AI_BACKEND: {AI_BACKEND}")
+                elif GEMINI_API_KEY:
+                    _backend = GeminiBackend(GEMINI_API_KEY, AI_TIMEOUT, AI_MAX_CONNECTIONS)
+    return _backend
+
+
+def set_backend(backend):
+    """Send verifications to backend from now on, e.g. a FakeBackend in a benchmark"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def get_cache():
+    """Return the shared result cache, or None when AI_CACHE is off"""
+    global _cache
+    if _cache is None and AI_CACHE:
+        with _backend_lock:
+            if _cache is None:
+                cache_dir = os.path.dirname(AI_CACHE_PATH)
+                if cache_dir and not os.path.exists(cache_dir):
+                    os.makedirs(cache_dir)
+                _cache = ResultCache(AI_CACHE_PATH, AI_CACHE_TTL, AI_CACHE_MAX_ENTRIES,
+                                     AI_CACHE_MAX_PIXEL_DIFF)
+    return _cache
+
+
+def cache_stats():
+    """Hit-rate statistics of the result cache, or None when it is off"""
+    cache = get_cache()
+    return cache.stats() if cache else None
+
+
+def image_data(image):
+    """Raw bytes of an image given as bytes or, as older callers do, a base64 string"""
+    if isinstance(image, str):
+        return base64.b64decode(image)
+    return bytes(image)
+
+
+def is_retryable(error):
+    """True for quota, server and network errors that may succeed on a later attempt"""
+    code = getattr(error, 'code', None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS
+
+    import httpx
+    return isinstance(error, (httpx.TimeoutException, httpx.TransportError))
+
+
+def generate(backend, **request):
+    """Call the backend's generate_content within the rate limit, retrying transient errors
+
+    Raises AIUnavailable while the circuit breaker is open or no request slot
+    frees up within AI_TIMEOUT, and re-raises the last error once retries run out.
+    """
+    for attempt in range(AI_RETRIES + 1):
+        # The breaker is asked first, so failing fast neither waits for nor spends a token
+        if not circuit_breaker.allow():
+            raise AIUnavailable("AI service is failing, paused after repeated errors",
+                                circuit_breaker.retry_after())
+        if not rate_limiter.acquire(timeout=AI_TIMEOUT):
+            circuit_breaker.cancel()
+            raise AIUnavailable("AI request rate limit reached", AI_TIMEOUT)
+
+        try:
+            response = backend.generate_content(**request)
+        except Exception as e:
+            if not is_retryable(e):
+                # The service answered; the request itself was bad
+                circuit_breaker.record_success()
+                raise
+            if getattr(e, 'code', None) == 429:
+                rate_limiter.throttle()
+            circuit_breaker.record_failure()
+            if attempt == AI_RETRIES:
+                raise
+            time.sleep(backoff_delay(attempt, AI_BACKOFF_BASE, AI_BACKOFF_MAX))
+            continue
+
+        circuit_breaker.record_success()
+        rate_limiter.recover()
+        return response
+
+
+def model_tiers():
+    """Models to try in order"""
+    if GEMINI_FAST_MODEL and GEMINI_FAST_MODEL != GEMINI_MODEL:
+        return [GEMINI_FAST_MODEL, GEMINI_MODEL]
+    return [GEMINI_MODEL]
+
+
+def parse_result(task, text):
+    """The reply as a dict if it is JSON carrying the task's main field, else None"""
     try:
-        prompt = """You are an environmental compliance officer. Analyze this image to determine if it shows legitimate waste management issues that require attention. 
-
-Respond with JSON format: {'valid': boolean, 'severity': 'low'|'medium'|'high', 'waste_type': string, 'description': string, 'action_required': boolean}
+        result = json.loads(text or "")
+    except ValueError:
+        return None
+    if not isinstance(result, dict) or not all(key in result for key in FAILURE_RESULTS[task]):
+        return None
+    return result
+
+
+def is_confident(result):
+    """False when the reply reports a confidence below AI_ESCALATION_THRESHOLD"""
+    confidence = result.get('confidence', result.get('confidence_score'))
+    if isinstance(confidence, (int, float)) and not isinstance(confidence, bool):
+        return confidence >= AI_ESCALATION_THRESHOLD
+    return True
+
+
+def routing_summary():
+    """Per-tier latency and per-task escalation rates of this process"""
+    return routing_stats.summary()
+
+
+def run_verification(task, image):
+    """Send an image to the AI backend with the prompt for task and return the parsed JSON reply
+
+    image is the raw photo bytes (a base64 string is still accepted). Results are
+    served from the result cache when the same image was verified with the same
+    model and prompt before; otherwise the photo is downscaled and re-encoded
+    with prepare_image before upload and sent through the model tiers: the fast
+    model's answer is kept unless it is malformed or not confident enough. The
+    model that answered is recorded in the result's 'model'. Failed
+    verifications are not cached.
+
+    A failure returns the task's FAILURE_RESULTS with an 'error'. When the call
+    was not attempted because the circuit breaker is open or the rate limit left
+    no slot, it also has 'retry_after', the seconds to wait before trying again.
+    """
+    failure = FAILURE_RESULTS[task]
+    image_bytes = image_data(image)
+    tiers = model_tiers()
+    backend = get_backend()
+    backend_name = backend.name if backend else AI_BACKEND
+    version = prompt_version(f"{backend_name}:{'>'.join(tiers)}@{AI_ESCALATION_THRESHOLD}", PROMPTS[task])
+
+    cache = get_cache()
+    if cache:
+        try:
+            cached = cache.get(task, version, image_bytes)
+            if cached is not None:
+                return cached
+        except Exception:
+            # A cache that cannot be read only costs a Gemini call
+            pass
+
+    if not backend:
+        return {**failure, "error": "Gemini API key not configured"}
+    if circuit_breaker.rejecting():
+        # Skip preparing an upload that would not be sent
+        return {**failure, "error": "AI service is failing, paused after repeated errors",
+                "retry_after": circuit_breaker.retry_after()}
 
-Please analyze this community-reported waste image and determine if it represents a valid environmental concern."""
-
-        response = client.models.generate_content(
-            model="gemini-2.5-pro",
-            contents=[
-                types.Part.from_bytes(
-                    data=base64.b64decode(base64_image),
-                    mime_type="image/jpeg",
-                ),
-                prompt
-            ],
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-            ),
-        )
-
-        if response.text:
-            result = json.loads(response.text)
+    try:
+        upload = prepare_image(image_bytes)
+
+        for tier, model in enumerate(tiers):
+            last_tier = tier == len(tiers) - 1
+            started = time.perf_counter()
+            try:
+                response = generate(backend, model=model, prompt=PROMPTS[task], image=upload)
+            except AIUnavailable:
+                raise
+            except Exception:
+                if last_tier:
+                    raise
+                # A failing fast model escalates like an unsure one
+                routing_stats.record_call(model, time.perf_counter() - started)
+                continue
+
+            routing_stats.record_call(model, time.perf_counter() - started)
+            result = parse_result(task, response)
+            if not last_tier and (result is None or not is_confident(result)):
+                continue
+
+            routing_stats.record_verification(task, escalated=tier > 0)
+
+            if result is None:
+                if not response:
+                    return {**failure, "error": "Empty response from Gemini"}
+                return {**failure, "error": "AI verification failed: malformed response from Gemini"}
+
+            result['model'] = model
+            if cache:
+                try:
+                    cache.put(task, version, image_bytes, result)
+                except Exception:
+                    pass
             return result
-        else:
-            return {"valid": False, "error": "Empty response from Gemini"}
 
+    except AIUnavailable as e:
+        return {**failure, "error": str(e), "retry_after": e.retry_after}
     except Exception as e:
-        return {"valid": False, "error": f"AI verification failed: {str(e)}"}
+        return {**failure, "error": f"AI verification failed: {str(e)}"}
 
 
-def verify_treatment_plant_delivery(base64_image):
-    """Verify treatment plant waste delivery"""
-    if not client:
-        return {"verified": False, "error": "Gemini API key not configured"}
+def verify_safety_kit_photo(image):
+    """Verify safety kit distribution using AI"""
+    return run_verification('safety_kit', image)
 
-    try:
-        prompt = """You are a waste treatment facility inspector. Analyze this image to verify proper waste delivery and segregation at the treatment plant. 
 
-Respond with JSON format: {'verified': boolean, 'segregation_quality': 'good'|'poor'|'average', 'vehicle_compliance': boolean, 'notes': string}
+def verify_waste_segregation(image):
+    """Verify waste segregation quality using AI"""
+    return run_verification('segregation', image)
 
-Please verify this waste delivery at the treatment plant. Check for proper segregation and compliance."""
 
-        response = client.models.generate_content(
-            model="gemini-2.5-pro",
-            contents=[
-                types.Part.from_bytes(
-                    data=base64.b64decode(base64_image),
-                    mime_type="image/jpeg",
-                ),
-                prompt
-            ],
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-            ),
-        )
-
-        if response.text:
-            result = json.loads(response.text)
-            return result
-        else:
-            return {"verified": False, "error": "Empty response from Gemini"}
+def analyze_community_report_image(image):
+    """Analyze community reported waste images"""
+    return run_verification('community_report', image)
 
-    except Exception as e:
-        return {"verified": False, "error": f"AI verification failed: {str(e)}"}
+
+def verify_treatment_plant_delivery(image):
+    """Verify treatment plant waste delivery"""
+    return run_verification('treatment_delivery', image)
+
+
+def verify_batch(items, verify, max_workers=None, on_progress=None):
+    """Run verify(item) for every item on a thread pool of at most max_workers
+
+    on_progress(done, total) is called from the calling thread as each item
+    finishes, so it may update Streamlit elements. Returns the (item, result)
+    pairs in input order and the elapsed seconds. A verify call that raises
+    gives {"error": ...} as its result.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    started = time.perf_counter()
+    if not items:
+        return [], 0.0
+
+    with ThreadPoolExecutor(max_workers=max_workers or AI_CONCURRENCY,
+                            thread_name_prefix="ai-verify") as executor:
+        futures = {executor.submit(verify, item): position for position, item in enumerate(items)}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"error": f"AI verification failed: {str(e)}"}
+            results[futures[future]] = result
+            if on_progress:
+                on_progress(done, len(items))
+
+    return list(zip(items, results)), time.perf_counter() - started
@@ -0,0 +1,131 @@
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import utils.database as database
+from utils.database import add_record, update_record, get_records, get_dashboard_stats, Between, In
+from utils.synthetic_data import generate_city, scale_for_rows
+
+# Storage benchmark suite. Generates a synthetic city per scale and times the
+# database API and the page analytics views against it. Page functions run with
+# Streamlit in bare mode, so widgets return their defaults and nothing is drawn.
+#
+#   python -m utils.benchmark --rows 10000,100000,1000000 --backend jsonl
+
+SCALES = [10_000, 100_000, 1_000_000]
+
+
+def use_data_dir(data_dir, backend):
+    """Point utils.database at another data directory and storage engine"""
+    if database._storage is not None:
+        database._storage.flush()
+    database.DATA_DIR = data_dir
+    database.STORAGE_BACKEND = backend
+    database._storage = None
+    database.get_store.clear()
+    database.init_database(prefetch=False)
+
+
+def timed(fn, repeat=1):
+    """Run fn repeat times; returns per-call seconds"""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def page_analytics():
+    """The analytics views of each page, imported on demand"""
+    from pages import community_reporting, rewards_fines, treatment_plant, vehicle_tracking
+    return {
+        'community_reporting.analytics': community_reporting.analytics,
+        'rewards_fines.analytics': rewards_fines.analytics,
+        'treatment_plant.performance_analytics': treatment_plant.performance_analytics,
+        'vehicle_tracking.performance_analytics': vehicle_tracking.performance_analytics,
+    }
+
+
+def run_scale(rows, backend, data_root, repeat, writes, regenerate=False):
+    """Benchmark one city size; returns a list of (operation, per-call seconds)"""
+    data_dir = os.path.join(data_root, f"{backend}-{rows}")
+    results = []
+
+    if regenerate or not os.path.exists(data_dir):
+        results.append(('generate city', timed(lambda: generate_city(data_dir, backend, **scale_for_rows(rows)))))
+
+    use_data_dir(data_dir, backend)
+    results.append(('load collections', timed(lambda: database.get_store().table('collections'))))
+    for table_name in database.TABLES:
+        database.get_store().table(table_name)
+
+    families = database.get_store().count('families')
+    collections = database.get_store().count('collections')
+    rng = random.Random(rows)
+    today = datetime.now().date()
+
+    def add_collection():
+        add_record('collections', {
+            'family_id': rng.randint(1, families),
+            'collection_date': str(today),
+            'segregation_quality': 'good',
+            'waste_types_collected': ["Organic/Wet Waste"],
+            'created_at': datetime.now().isoformat()
+        })
+
+    def update_collection():
+        update_record('collections', rng.randint(1, collections), {'collection_notes': 'benchmark'})
+
+    results.append(('add_record', timed(add_collection, writes)))
+    results.append(('update_record', timed(update_collection, writes)))
+    database.get_storage().flush()
+
+    week = Between.dates(today - timedelta(days=7), today)
+    results.append(('get_records all', timed(lambda: get_records('collections'), repeat)))
+    results.append(('get_records by family_id',
+                    timed(lambda: get_records('collections', {'family_id': rng.randint(1, families)}), repeat)))
+    results.append(('get_records last 7 days', timed(lambda: get_records('collections', {'created_at': week}), repeat)))
+    results.append(('get_records scan filter',
+                    timed(lambda: get_records('collections', {'segregation_quality': 'poor'}), repeat)))
+    results.append(('get_records latest 10', timed(lambda: get_records(
+        'rewards_fines', {'type': In(['reward', 'incentive'])}, order_by='-created_at', limit=10), repeat)))
+    results.append(('get_dashboard_stats', timed(get_dashboard_stats, repeat)))
+
+    for name, view in page_analytics().items():
+        try:
+            results.append((name, timed(view, repeat)))
+        except Exception as e:
+            print(f"Skipping {name}: {str(e)}")
+
+    return results
+
+
+def report(rows, backend, results):
+    print(f"\n{backend} - {rows:,} collection rows")
+    print(f"{'operation':42} {'calls':>6} {'median ms':>11} {'max ms':>10}")
+    for name, times in results:
+        print(f"{name:42} {len(times):>6} {statistics.median(times) * 1000:>11.2f} {max(times) * 1000:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark EcoWork storage at several city sizes")
+    parser.add_argument("--rows", default=",".join(str(rows) for rows in SCALES),
+                        help="Comma-separated collection row counts")
+    parser.add_argument("--backend", default=database.STORAGE_BACKEND, choices=["json", "jsonl", "sqlite"])
+    parser.add_argument("--data-root", default="data_bench", help="Where generated cities are kept")
+    parser.add_argument("--repeat", type=int, default=5, help="Calls per read benchmark")
+    parser.add_argument("--writes", type=int, default=200, help="Calls per write benchmark")
+    parser.add_argument("--regenerate", action="store_true", help="Rebuild cities that already exist")
+    args = parser.parse_args()
+
+    for rows in [int(value) for value in args.rows.split(",")]:
+        results = run_scale(rows, args.backend, args.data_root, args.repeat, args.writes, args.regenerate)
+        report(rows, args.backend, results)
+
+
+if __name__ == "__main__":
+    main()
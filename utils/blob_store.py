@@ -0,0 +1,185 @@
+import hashlib
+import os
+import threading
+from io import BytesIO
+
+from utils.process_pool import process_pool
+
+# Uploaded photos, stored on disk by the SHA-256 of their content. The same photo
+# uploaded twice is stored once, and records keep a small reference dict instead of
+# the bytes. Thumbnails of each new photo are made in the background by a process
+# pool, in every size of THUMBNAIL_SIZES, so resizing never blocks the app.
+PHOTO_STORE_DIR = os.environ.get("PHOTO_STORE_DIR", os.path.join("data", "photos"))
+THUMBNAIL_SIZES = [int(size) for size in os.environ.get("THUMBNAIL_SIZES", "160,640").split(",")]
+THUMBNAIL_FORMAT = os.environ.get("THUMBNAIL_FORMAT", "WEBP")
+THUMBNAIL_WORKERS = int(os.environ.get("THUMBNAIL_WORKERS", "2"))
+
+# Uploads are copied and hashed this many bytes at a time
+CHUNK_SIZE = 1024 * 1024
+
+THUMBNAIL_EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+
+def supported_format(image_format):
+    """image_format if this Pillow can write it, else JPEG"""
+    from PIL import features
+
+    if image_format == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return image_format if image_format in THUMBNAIL_EXTENSIONS else 'JPEG'
+
+
+def make_thumbnails(source, targets):
+    """Write thumbnails of the image at source; targets maps a long-side size to a path
+
+    The image is decoded once, at the reduced scale draft mode allows for the
+    largest size, and each thumbnail is shrunk from the previous one. The format
+    comes from each path's extension. Runs in the thumbnail worker processes.
+    """
+    from PIL import Image, ImageOps
+
+    largest = max(targets)
+    with Image.open(source) as image:
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        for size in sorted(targets, reverse=True):
+            image.thumbnail((size, size), Image.LANCZOS)
+            target = targets[size]
+            image_format = 'WEBP' if target.endswith('.webp') else 'JPEG'
+            temp_path = f"{target}.{os.getpid()}.tmp"
+            image.save(temp_path, format=image_format, quality=80)
+            os.replace(temp_path, target)
+    return list(targets.values())
+
+
+class BlobStore:
+    """Content-addressed file store, laid out as root/ab/cd/abcd..."""
+
+    def __init__(self, root, thumbnail_sizes=(160, 640), thumbnail_format='WEBP', thumbnail_workers=2):
+        self.root = root
+        self.thumbnail_sizes = sorted(thumbnail_sizes)
+        self.thumbnail_extension = THUMBNAIL_EXTENSIONS[supported_format(thumbnail_format)]
+        self.thumbnail_workers = thumbnail_workers
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        if not os.path.exists(root):
+            os.makedirs(root)
+
+    def path(self, sha256):
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def thumbnail_path(self, sha256, size):
+        return f"{self.path(sha256)}.{size}.{self.thumbnail_extension}"
+
+    def thumbnail_targets(self, sha256):
+        return {size: self.thumbnail_path(sha256, size) for size in self.thumbnail_sizes}
+
+    def pool(self):
+        """The thumbnail worker processes, started on first use"""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = process_pool(self.thumbnail_workers)
+        return self._pool
+
+    def exists(self, sha256):
+        return os.path.exists(self.path(sha256))
+
+    def put(self, data):
+        """Store bytes or a file-like object; returns (sha256, size)
+
+        File objects are copied in CHUNK_SIZE pieces and hashed on the way, so
+        an upload is never held in memory twice. Content that is already stored
+        is not written again.
+        """
+        stream = BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+        if hasattr(stream, 'seek'):
+            stream.seek(0)
+
+        digest = hashlib.sha256()
+        size = 0
+        temp_path = os.path.join(self.root, f"upload.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(temp_path, 'wb') as f:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+
+        sha256 = digest.hexdigest()
+        path = self.path(sha256)
+        if os.path.exists(path):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+            self.queue_thumbnails(sha256)
+        return sha256, size
+
+    def queue_thumbnails(self, sha256):
+        """Make the photo's thumbnails in the background; returns the future, or None"""
+        try:
+            return self.pool().submit(make_thumbnails, self.path(sha256), self.thumbnail_targets(sha256))
+        except Exception:
+            # Without worker processes thumbnails are made when first shown
+            return None
+
+    def read(self, sha256):
+        with open(self.path(sha256), 'rb') as f:
+            return f.read()
+
+    def thumbnail(self, sha256, size=None):
+        """Path of the smallest thumbnail at least size pixels on its long side
+
+        A thumbnail that is missing (the photo predates it, or the background job
+        has not run yet) is made here. Returns None for photos that are not
+        images Pillow can read.
+        """
+        size = next((each for each in self.thumbnail_sizes if each >= (size or 0)), self.thumbnail_sizes[-1])
+        path = self.thumbnail_path(sha256, size)
+        if not os.path.exists(path):
+            try:
+                make_thumbnails(self.path(sha256), self.thumbnail_targets(sha256))
+            except Exception:
+                return None
+        return path
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store():
+    """Return the process-wide photo store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = BlobStore(PHOTO_STORE_DIR, THUMBNAIL_SIZES, THUMBNAIL_FORMAT, THUMBNAIL_WORKERS)
+    return _store
+
+
+def save_upload(uploaded_file):
+    """Store an st.file_uploader upload; returns the reference to keep on the record"""
+    sha256, size = get_blob_store().put(uploaded_file)
+    return {
+        'sha256': sha256,
+        'name': getattr(uploaded_file, 'name', ''),
+        'type': getattr(uploaded_file, 'type', ''),
+        'size': size
+    }
+
+
+def save_uploads(uploaded_files):
+    """Store each upload that was given, skipping empty uploader slots"""
+    return [save_upload(uploaded_file) for uploaded_file in uploaded_files if uploaded_file is not None]
+
+
+def read_photo(photo):
+    """Bytes of a stored photo, given its reference or its SHA-256"""
+    return get_blob_store().read(photo['sha256'] if isinstance(photo, dict) else photo)
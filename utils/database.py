@@ -1,132 +1,578 @@
-import pandas as pd
 import json
 import os
+import base64
+import threading
+from bisect import bisect_left, bisect_right
 from datetime import datetime, timedelta
 import streamlit as st
+from contextlib import contextmanager
+from utils.storage import create_storage, WriteBehind, INDEXED_FIELDS
+from utils.query import Predicate, Between, In, Prefix, Not, matches_filters
 
-# Database simulation using session state and local files
+# Database simulation using a process-wide in-memory store and local files
 DATA_DIR = "data"
 
+# Storage engine: "jsonl" (JSON snapshot plus an append-only log, constant cost per
+# write), "json" (rewrite data/<table>.json on every write) or "sqlite" (one WAL-mode
+# SQLite database, migrated from the JSON files on first access).
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "jsonl")
 
-def init_database():
-    """Initialize database tables in session state"""
+# Fold the JSONL log back into the JSON snapshot once replay has to apply this many entries
+LOG_COMPACT_THRESHOLD = int(os.environ.get("LOG_COMPACT_THRESHOLD", "5000"))
+
+# Write durability: "sync" persists each write before returning, "group" batches
+# concurrent writes into one fsync'd flush and waits for it, "async" returns at once
+# and leaves the write to the background flusher.
+DURABILITY = os.environ.get("DURABILITY", "group")
+
+# How long the background flusher waits for more writes to join a batch, in seconds
+FLUSH_WINDOW = float(os.environ.get("FLUSH_WINDOW", "0.02"))
+
+# Load every known table on a background thread at startup instead of only on first use
+PREFETCH_TABLES = os.environ.get("PREFETCH_TABLES", "0") == "1"
+
+# Field backing the sorted time index
+TIME_FIELD = 'created_at'
+
+# Per-table counts of records by field value, kept current on every write so the
+# dashboard does not scan tables. Fields in DAY_FIELDS are counted by their date part.
+COUNTED_FIELDS = {
+    'workers': ['status'],
+    'collections': ['date', 'segregation_quality'],
+    'training_records.json': ['status'],
+}
+DAY_FIELDS = {'date'}
+
+TABLES = [
+    'families', 'workers', 'collections', 'vehicles',
+    'community_reports', 'rewards_fines', 'training_records.json',
+    'safety_kits', 'treatment_reports', 'collection_routes'
+]
+
+_storage = None
+_batch = threading.local()
+
+
+def get_storage():
+    """Return the configured storage engine, creating it on first use"""
+    global _storage
+    if _storage is None:
+        if not os.path.exists(DATA_DIR):
+            os.makedirs(DATA_DIR)
+        engine = create_storage(STORAGE_BACKEND, DATA_DIR, LOG_COMPACT_THRESHOLD)
+        _storage = WriteBehind(engine, DURABILITY, FLUSH_WINDOW, snapshot=_snapshot_table)
+    return _storage
+
+
+def _snapshot_table(table_name):
+    """Copy a table under the store lock for engines that rewrite whole files"""
+    store = get_store()
+    with store.lock:
+        return [dict(record) for record in store.tables.get(table_name, [])]
+
+
+@contextmanager
+def batch_writes():
+    """Group every write made inside the block into one flush
+
+    In "group" durability mode each add_record/update_record normally waits for its
+    own flush. Inside this block they return as soon as they are queued, and the
+    block waits once at the end, so a form submit that writes several tables pays
+    for a single fsync.
+    """
+    outer = getattr(_batch, 'tickets', None)
+    if outer is None:
+        _batch.tickets = []
+    try:
+        yield
+    finally:
+        if outer is None:
+            tickets, _batch.tickets = _batch.tickets, None
+            for ticket in tickets:
+                _commit(ticket)
+
+
+def _commit(ticket):
+    """Wait for a queued write, or defer the wait to the enclosing batch_writes block"""
+    if ticket is None:
+        return
+    tickets = getattr(_batch, 'tickets', None)
+    if tickets is not None:
+        tickets.append(ticket)
+        return
+    try:
+        get_storage().wait(ticket)
+    except Exception as e:
+        st.error(f"Error saving data: {str(e)}")
+
+
+class TableStore:
+    """Tables shared by every browser session of this server process
+
+    Each table keeps a hash index on 'id' and on the foreign keys in
+    INDEXED_FIELDS, maintained on every write, so point lookups are O(1), a
+    sorted index on 'created_at' for time ranges, and the COUNTED_FIELDS tallies.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.tables = {}
+        self.by_id = {}
+        self.indexes = {}
+        self.time_keys = {}
+        self.time_records = {}
+        self.counts = {}
+        self.lock = threading.RLock()
+        self.load_locks = {}
+        self.prefetch_thread = None
+
+    def table(self, table_name):
+        """Return the live list of records for a table, loading it on first use
+
+        Loading happens under a per-table lock, outside the store lock, so a slow
+        table does not block sessions working on tables that are already loaded.
+        Callers must not hold the store lock when a table may still be unloaded.
+        """
+        records = self.tables.get(table_name)
+        if records is not None:
+            return records
+
+        with self.lock:
+            load_lock = self.load_locks.setdefault(table_name, threading.Lock())
+
+        with load_lock:
+            if table_name not in self.tables:
+                self.set_table(table_name, load_data(table_name))
+        return self.tables[table_name]
+
+    def prefetch(self, table_names):
+        """Load tables on a background thread, once per process"""
+        with self.lock:
+            if self.prefetch_thread is not None:
+                return
+            self.prefetch_thread = threading.Thread(
+                target=lambda: [self.table(name) for name in table_names],
+                name="table-prefetch",
+                daemon=True
+            )
+        self.prefetch_thread.start()
+
+    def set_table(self, table_name, records):
+        """Replace a table's records and rebuild its indexes"""
+        with self.lock:
+            self.tables[table_name] = records
+            self.by_id[table_name] = {}
+            self.indexes[table_name] = {field: {} for field in INDEXED_FIELDS}
+            self.counts[table_name] = {}
+            for record in records:
+                self.index_record(table_name, record, timed=False)
+
+            timed = sorted((r for r in records if isinstance(r.get(TIME_FIELD), str)),
+                           key=lambda r: r[TIME_FIELD])
+            self.time_keys[table_name] = [r[TIME_FIELD] for r in timed]
+            self.time_records[table_name] = timed
+
+    def index_record(self, table_name, record, timed=True):
+        self.by_id[table_name][record.get('id')] = record
+        for field, index in self.indexes[table_name].items():
+            if field in record:
+                index.setdefault(record[field], []).append(record)
+        self.count_record(table_name, record, 1)
+        if timed:
+            self.index_time(table_name, record)
+
+    def count_record(self, table_name, record, delta):
+        """Add delta to the tallies for each counted field of a record"""
+        counts = self.counts[table_name]
+        for field in COUNTED_FIELDS.get(table_name, []):
+            value = record.get(field)
+            if field in DAY_FIELDS:
+                value = value[:10] if isinstance(value, str) else None
+            try:
+                counts[(field, value)] = counts.get((field, value), 0) + delta
+            except TypeError:
+                # Unhashable values are not counted
+                pass
+
+    def count(self, table_name, field=None, value=None):
+        """Number of records in a table, or of those whose counted field has value"""
+        records = self.table(table_name)
+        if field is None:
+            return len(records)
+        return self.counts[table_name].get((field, value), 0)
+
+    def index_time(self, table_name, record):
+        """Insert a record into the created_at index"""
+        if not isinstance(record.get(TIME_FIELD), str):
+            return
+        # New records carry the current time, so this is normally an append
+        keys = self.time_keys[table_name]
+        position = bisect_right(keys, record[TIME_FIELD])
+        keys.insert(position, record[TIME_FIELD])
+        self.time_records[table_name].insert(position, record)
+
+    def reindex_field(self, table_name, record, field, old_value, had_field):
+        """Move a record between index buckets after one of its indexed fields changed"""
+        index = self.indexes[table_name][field]
+        if had_field:
+            bucket = index.get(old_value, [])
+            bucket[:] = [r for r in bucket if r is not record]
+            if not bucket:
+                index.pop(old_value, None)
+        if field in record:
+            index.setdefault(record[field], []).append(record)
+
+    def unindex_time(self, table_name, record):
+        """Drop a record from the created_at index before its created_at changes"""
+        if not isinstance(record.get(TIME_FIELD), str):
+            return
+        keys = self.time_keys[table_name]
+        records = self.time_records[table_name]
+        position = bisect_left(keys, record[TIME_FIELD])
+        while position < len(keys) and keys[position] == record[TIME_FIELD]:
+            if records[position] is record:
+                del keys[position]
+                del records[position]
+                return
+            position += 1
+
+    def get(self, table_name, record_id):
+        """Return the record with this id, or None"""
+        self.table(table_name)
+        return self.by_id[table_name].get(record_id)
+
+    def lookup(self, table_name, field, value):
+        """Return the records whose indexed field equals value"""
+        self.table(table_name)
+        if field == 'id':
+            record = self.by_id[table_name].get(value)
+            return [record] if record is not None else []
+        return self.indexes[table_name][field].get(value, [])
+
+    def time_range(self, table_name, low=None, high=None, high_exclusive=False):
+        """Return records whose created_at lies between low and high, oldest first"""
+        self.table(table_name)
+        with self.lock:
+            keys = self.time_keys[table_name]
+            start = bisect_left(keys, low) if low is not None else 0
+            if high is None:
+                end = len(keys)
+            else:
+                end = bisect_left(keys, high) if high_exclusive else bisect_right(keys, high)
+            return self.time_records[table_name][start:end]
+
+    def time_index_complete(self, table_name):
+        """True when every record of the table is in the created_at index"""
+        self.table(table_name)
+        return len(self.time_keys[table_name]) == len(self.tables[table_name])
+
+    def scan_time(self, table_name, filters, descending=False, limit=None, after=None):
+        """Walk the created_at index in order and collect up to limit matching records
+
+        after is a (created_at, id) pair; only records strictly past it in walk order
+        are returned. The walk stops at the first record outside a created_at range
+        filter, so fetching the latest N records touches about N entries.
+        """
+        self.table(table_name)
+        bounds = filters.get(TIME_FIELD) if filters else None
+        low = bounds.low if isinstance(bounds, Between) else None
+        high = bounds.high if isinstance(bounds, Between) else None
+
+        with self.lock:
+            keys = self.time_keys[table_name]
+            records = self.time_records[table_name]
+
+            if descending:
+                position = len(keys) - 1
+                if high is not None:
+                    position = bisect_right(keys, high) - 1
+                if after is not None:
+                    position = min(position, bisect_right(keys, after[0]) - 1)
+                step = -1
+            else:
+                position = 0
+                if low is not None:
+                    position = bisect_left(keys, low)
+                if after is not None:
+                    position = max(position, bisect_left(keys, after[0]))
+                step = 1
+
+            found = []
+            while 0 <= position < len(keys):
+                key = keys[position]
+                if (descending and low is not None and key < low) or \
+                        (not descending and high is not None and key > high):
+                    break
+                record = records[position]
+                position += step
+
+                if after is not None and key == after[0]:
+                    record_id = record.get('id') or 0
+                    if (descending and record_id >= after[1]) or (not descending and record_id <= after[1]):
+                        continue
+                if filters and not matches_filters(record, filters):
+                    continue
+                found.append(record)
+                if limit is not None and len(found) >= limit:
+                    break
+            return found
+
+    def candidates(self, table_name, filters):
+        """Use an index to narrow the records that can match filters
+
+        Returns a superset of the matches; the caller still checks every filter.
+        """
+        records = self.table(table_name)
+
+        for field in ['id'] + INDEXED_FIELDS:
+            if field not in filters:
+                continue
+            value = filters[field]
+            try:
+                if isinstance(value, In):
+                    found = {}
+                    for item in value.values:
+                        for record in self.lookup(table_name, field, item):
+                            found[id(record)] = record
+                    return sorted(found.values(), key=lambda r: r.get('id') or 0)
+                if not isinstance(value, Predicate):
+                    return self.lookup(table_name, field, value)
+            except TypeError:
+                # Unhashable filter value, fall back to a scan
+                pass
+
+        value = filters.get(TIME_FIELD)
+        if isinstance(value, Between):
+            return self.time_range(table_name, value.low, value.high)
+        if isinstance(value, Prefix):
+            # Every key with the prefix sorts before prefix + U+FFFF
+            return self.time_range(table_name, value.prefix, value.prefix + "\uffff", high_exclusive=True)
+
+        return records
+
+
+@st.cache_resource
+def get_store():
+    """Return the process-wide table store"""
+    return TableStore(get_storage())
+
+
+def init_database(prefetch=None):
+    """Initialize the shared table store
+
+    Tables are loaded lazily by the first get_records/add_record/update_record
+    that touches them. With prefetch (default: PREFETCH_TABLES) the known tables
+    are also warmed on a background thread.
+    """
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
 
-    # Initialize session state tables if they don't exist
-    tables = [
-        'families', 'workers', 'collections', 'vehicles',
-        'community_reports', 'rewards_fines', 'training_records.json',
-        'safety_kits', 'treatment_reports', 'collection_routes'
-    ]
+    store = get_store()
 
-    for table in tables:
-        if table not in st.session_state:
-            st.session_state[table] = load_data(table)
+    if PREFETCH_TABLES if prefetch is None else prefetch:
+        store.prefetch(TABLES)
 
 
 def load_data(table_name):
-    """Load data from JSON file"""
-    file_path = os.path.join(DATA_DIR, f"{table_name}.json")
+    """Load data from the storage engine"""
     try:
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as f:
-                return json.load(f)
-        return []
+        return get_storage().load(table_name)
     except:
         return []
 
 
 def save_data(table_name, data):
-    """Save data to JSON file"""
-    file_path = os.path.join(DATA_DIR, f"{table_name}.json")
+    """Save a whole table to the storage engine"""
+    store = get_store()
+    storage = get_storage()
     try:
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=2, default=str)
-        st.session_state[table_name] = data
+        # Flush outside the store lock: the flusher may need it to snapshot a table
+        storage.flush()
+        with store.lock:
+            storage.save(table_name, data)
+            store.set_table(table_name, data)
     except Exception as e:
         st.error(f"Error saving data: {str(e)}")
 
 
 def add_record(table_name, record):
     """Add a new record to the specified table"""
-    if table_name not in st.session_state:
-        st.session_state[table_name] = []
+    store = get_store()
+    records = store.table(table_name)
 
-    # Add timestamp and unique ID
-    record['id'] = len(st.session_state[table_name]) + 1
-    record['created_at'] = datetime.now().isoformat()
+    with store.lock:
+        # Add timestamp and unique ID
+        record['id'] = get_storage().next_id(table_name, records)
+        record['created_at'] = datetime.now().isoformat()
 
-    st.session_state[table_name].append(record)
-    save_data(table_name, st.session_state[table_name])
+        records.append(record)
+        store.index_record(table_name, record)
+        ticket = None
+        try:
+            ticket = get_storage().insert(table_name, record, records)
+        except Exception as e:
+            st.error(f"Error saving data: {str(e)}")
 
+    _commit(ticket)
     return record
 
 
 def update_record(table_name, record_id, updates):
     """Update an existing record"""
-    if table_name in st.session_state:
-        for i, record in enumerate(st.session_state[table_name]):
-            if record.get('id') == record_id:
-                st.session_state[table_name][i].update(updates)
-                st.session_state[table_name][i]['updated_at'] = datetime.now().isoformat()
-                save_data(table_name, st.session_state[table_name])
-                return True
-    return False
-
-
-def get_records(table_name, filters=None):
-    """Get records from the specified table with optional filters"""
-    if table_name not in st.session_state:
-        return []
+    store = get_store()
+    records = store.table(table_name)
+
+    with store.lock:
+        record = store.get(table_name, record_id)
+        if record is None:
+            return False
+
+        changes = dict(updates)
+        changes['updated_at'] = datetime.now().isoformat()
+        previous = {field: (record.get(field), field in record) for field in INDEXED_FIELDS if field in changes}
+        recount = any(field in changes for field in COUNTED_FIELDS.get(table_name, []))
+        if TIME_FIELD in changes:
+            store.unindex_time(table_name, record)
+        if recount:
+            store.count_record(table_name, record, -1)
+        record.update(changes)
+        if recount:
+            store.count_record(table_name, record, 1)
+        for field, (old_value, had_field) in previous.items():
+            store.reindex_field(table_name, record, field, old_value, had_field)
+        if TIME_FIELD in changes:
+            store.index_time(table_name, record)
 
-    records = st.session_state[table_name]
+        ticket = None
+        try:
+            ticket = get_storage().update(table_name, record, changes, records)
+        except Exception as e:
+            st.error(f"Error saving data: {str(e)}")
+
+    _commit(ticket)
+    return True
+
+
+def get_records(table_name, filters=None, order_by=None, limit=None):
+    """Get records from the specified table with optional filters
+
+    A filter value is either matched exactly or is a predicate from utils.query:
+    Between (ranges, Between.dates for created_at days), In, Prefix and Not.
+    Filters on 'id', the foreign keys in INDEXED_FIELDS and created_at are
+    answered from the store's indexes before the remaining filters are checked.
+
+    order_by ('field' or '-field') and limit return the first records in that
+    order; see get_page for resuming with a cursor.
+
+    Returns a new list for the caller's session; the record dicts themselves are
+    shared and must be changed through update_record.
+    """
+    if order_by is not None or limit is not None:
+        return get_page(table_name, filters, order_by or 'id', limit)[0]
+
+    store = get_store()
+    records = store.table(table_name)
 
     if filters:
-        filtered_records = []
-        for record in records:
-            match = True
-            for key, value in filters.items():
-                if key not in record or record[key] != value:
-                    match = False
-                    break
-            if match:
-                filtered_records.append(record)
-        return filtered_records
+        return [record for record in store.candidates(table_name, filters)
+                if matches_filters(record, filters)]
+
+    return list(records)
+
+
+def _order_key(record, field):
+    """Sort key that orders any mix of field values: grouped by kind, missing and None last"""
+    value = record.get(field)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        kind = 'number'
+    else:
+        kind = type(value).__name__
+        if value is not None and not isinstance(value, (str, bool)):
+            value = json.dumps(value, sort_keys=True, default=str)
+    return (value is None, kind, 0 if value is None else value, record.get('id') or 0)
+
+
+def _encode_cursor(order_by, record):
+    field = order_by.lstrip('-')
+    payload = json.dumps([order_by, record.get(field), record.get('id') or 0], default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_cursor(order_by, cursor):
+    try:
+        cursor_order, value, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if cursor_order != order_by:
+        raise ValueError(f"Cursor was issued for order_by={cursor_order!r}, not {order_by!r}")
+    return value, record_id
+
+
+def get_page(table_name, filters=None, order_by='-created_at', limit=20, cursor=None):
+    """Get one page of records in order, plus a cursor for the next page
+
+    order_by names a field, prefixed with '-' for descending; ties are broken by id.
+    Pass the returned cursor back to continue after the last record of this page;
+    it is None once there are no more records. Ordering by created_at walks the
+    store's time index, so the latest N records cost O(N) rather than a full sort.
+    """
+    store = get_store()
+    store.table(table_name)
+    field = order_by.lstrip('-')
+    descending = order_by.startswith('-')
+    after = _decode_cursor(order_by, cursor) if cursor else None
+    fetch = limit + 1 if limit is not None else None
+
+    narrowed = filters and any(
+        field_name in filters and not isinstance(filters[field_name], (Between, Prefix, Not))
+        for field_name in ['id'] + INDEXED_FIELDS
+    )
+
+    if field == TIME_FIELD and not narrowed and store.time_index_complete(table_name):
+        records = store.scan_time(table_name, filters, descending, fetch, after)
+    else:
+        records = get_records(table_name, filters) if filters else list(store.table(table_name))
+        records.sort(key=lambda r: _order_key(r, field), reverse=descending)
+        if after is not None:
+            after = _order_key({field: after[0], 'id': after[1]}, field)
+            records = [r for r in records
+                       if (_order_key(r, field) < after if descending else _order_key(r, field) > after)]
+        if fetch is not None:
+            records = records[:fetch]
 
-    return records
+    next_cursor = None
+    if limit is not None and len(records) > limit:
+        records = records[:limit]
+        next_cursor = _encode_cursor(order_by, records[-1])
+    return records, next_cursor
 
 
 def get_dashboard_stats():
-    """Get statistics for the dashboard"""
+    """Get statistics for the dashboard from the store's maintained counts"""
+    store = get_store()
     stats = {}
 
     # Count families
-    families = get_records('families')
-    stats['families'] = len(families)
+    stats['families'] = store.count('families')
 
     # Count workers
-    workers = get_records('workers')
-    stats['workers'] = len([w for w in workers if w.get('status') == 'active'])
+    stats['workers'] = store.count('workers', 'status', 'active')
 
     # Count today's collections
     today = datetime.now().date().isoformat()
-    collections = get_records('collections')
-    stats['collections_today'] = len([c for c in collections if c.get('date', '').startswith(today)])
+    stats['collections_today'] = store.count('collections', 'date', today)
 
     # Count community reports
-    reports = get_records('community_reports')
-    stats['community_reports'] = len(reports)
+    stats['community_reports'] = store.count('community_reports')
 
     # Training completion rate
-    training_records = get_records('training_records.json')
-    completed = len([t for t in training_records if t.get('status') == 'completed'])
-    pending = len([t for t in training_records if t.get('status') == 'pending'])
+    completed = store.count('training_records.json', 'status', 'completed')
+    pending = store.count('training_records.json', 'status', 'pending')
     stats['training_completion'] = {'completed': completed, 'pending': pending}
 
     # Segregation quality
-    good_segregation = len([c for c in collections if c.get('segregation_quality') == 'good'])
-    poor_segregation = len([c for c in collections if c.get('segregation_quality') == 'poor'])
+    good_segregation = store.count('collections', 'segregation_quality', 'good')
+    poor_segregation = store.count('collections', 'segregation_quality', 'poor')
     stats['segregation_quality'] = {'good': good_segregation, 'poor': poor_segregation}
 
     # Recent alerts (mock for now)
@@ -0,0 +1,36 @@
+import os
+from io import BytesIO
+
+# Photos are shrunk before they are sent for AI verification: a phone camera JPEG of
+# 4-8 MB becomes a few hundred KB, which the model reads just as well.
+AI_IMAGE_MAX_EDGE = int(os.environ.get("AI_IMAGE_MAX_EDGE", "1536"))
+AI_IMAGE_QUALITY = int(os.environ.get("AI_IMAGE_QUALITY", "85"))
+
+
+def prepare_image(image_bytes, max_edge=None, quality=None):
+    """Downscale an image to max_edge on its long side and re-encode it as a JPEG without EXIF
+
+    JPEGs are decoded in draft mode, so the decoder scales by 1/2, 1/4 or 1/8 while
+    reading instead of building the full-resolution bitmap. EXIF orientation is
+    applied to the pixels before the metadata is dropped. Returns the original
+    bytes if the image cannot be decoded.
+    """
+    from PIL import Image, ImageOps
+
+    max_edge = max_edge or AI_IMAGE_MAX_EDGE
+    quality = quality or AI_IMAGE_QUALITY
+
+    try:
+        with Image.open(BytesIO(image_bytes)) as image:
+            image.draft('RGB', (max_edge, max_edge))
+            image = ImageOps.exif_transpose(image)
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+            output = BytesIO()
+            image.save(output, format='JPEG', quality=quality, optimize=True)
+    except Exception:
+        return image_bytes
+
+    return output.getvalue()
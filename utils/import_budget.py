@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Import-time budget for app startup and each page. Every module is imported in a
+# fresh interpreter, as a new server process would, and the run fails when one goes
+# over its budget or when app.py pulls in a library that only pages should load.
+#
+#   python -m utils.import_budget
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Module -> budget in milliseconds
+IMPORT_BUDGET_MS = {
+    'app': 1200,
+    'pages.training': 1500,
+    'pages.household_management': 1500,
+    'pages.waste_collection': 1500,
+    'pages.worker_management': 1500,
+    'pages.vehicle_tracking': 1500,
+    'pages.treatment_plant': 1500,
+    'pages.community_reporting': 1500,
+    'pages.rewards_fines': 1500,
+}
+
+# Libraries that must not be loaded just by starting the app (Streamlit itself
+# already brings in PIL and plotly)
+DEFERRED_MODULES = ['pandas', 'qrcode', 'google.genai']
+
+MEASURE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{'ms': elapsed * 1000, 'loaded': [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module, runs=3):
+    """Best-of-runs import time of module in a fresh interpreter; returns (ms, deferred modules loaded)"""
+    best = None
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", MEASURE.format(module=module, deferred=DEFERRED_MODULES)],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if best is None or result['ms'] < best['ms']:
+            best = result
+    return best['ms'], best['loaded']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check import times against the budget")
+    parser.add_argument("--runs", type=int, default=3, help="Imports per module; the fastest counts")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':30} {'ms':>8} {'budget':>8}")
+    for module, budget in IMPORT_BUDGET_MS.items():
+        ms, loaded = measure(module, args.runs)
+        status = "ok" if ms <= budget else "OVER"
+        print(f"{module:30} {ms:>8.0f} {budget:>8} {status}")
+        if ms > budget:
+            failures.append(f"{module} took {ms:.0f}ms (budget {budget}ms)")
+        if module == 'app' and loaded:
+            failures.append(f"app imports {', '.join(loaded)} at startup")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import streamlit as st
+from utils.blob_store import get_blob_store
+
+# Record lists show GALLERY_PAGE_SIZE records at a time, so only the thumbnails of
+# the visible page are sent to the browser. Full-size photos load when asked for.
+GALLERY_PAGE_SIZE = 10
+THUMBNAIL_WIDTH = 160
+
+
+def paginate(items, key, page_size=GALLERY_PAGE_SIZE):
+    """Show a page selector for items and return the items on the selected page"""
+    pages = max(1, -(-len(items) // page_size))
+    if pages == 1:
+        return items
+
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1, key=key)
+    start = (page - 1) * page_size
+    st.caption(f"Showing {start + 1}-{min(start + page_size, len(items))} of {len(items)}")
+    return items[start:start + page_size]
+
+
+def photo_gallery(photos, key, columns=4):
+    """Show thumbnails of a record's stored photos, each with a toggle for the full-size image"""
+    if not photos:
+        return
+
+    store = get_blob_store()
+    for row in range(0, len(photos), columns):
+        for number, (column, photo) in enumerate(zip(st.columns(columns), photos[row:row + columns]), row):
+            with column:
+                if not store.exists(photo['sha256']):
+                    st.caption(f"📷 {photo.get('name') or 'Photo'} (missing)")
+                    continue
+
+                thumbnail = store.thumbnail(photo['sha256'], THUMBNAIL_WIDTH)
+                if thumbnail:
+                    st.image(thumbnail, caption=photo.get('name'), width=THUMBNAIL_WIDTH)
+                else:
+                    st.caption(f"📷 {photo.get('name') or 'Photo'}")
+
+                if st.toggle("🔍 Full size", key=f"{key}_full_{number}"):
+                    st.image(store.read(photo['sha256']))
@@ -0,0 +1,14 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Pools always use "spawn". Forking the Streamlit server would copy its tornado
+# loop, the write-behind flusher, the AI job workers and the prefetch thread
+# mid-flight, and a child that inherits a lock held by one of them deadlocks.
+# Spawned children start a fresh interpreter and import the main script as
+# __mp_main__; app.py only calls main() under its __name__ == "__main__" guard,
+# so the app is not run again in the workers. Tasks only need Pillow and qrcode.
+
+
+def process_pool(max_workers):
+    """A ProcessPoolExecutor that is safe to start from a Streamlit page"""
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
@@ -1,9 +1,84 @@
+import os
+import re
+import hmac
 import qrcode
 import base64
+import binascii
+import hashlib
+import secrets
+import threading
+from collections import OrderedDict
 from io import BytesIO
 from PIL import Image
 import streamlit as st
-import pandas as pd
+
+# QR codes carry a compact signed payload: one byte holding the format version and
+# entity type, the entity id as a varint, and the first QR_SIGNATURE_BYTES of an
+# HMAC-SHA256, base32-encoded. Uppercase base32 uses only QR alphanumeric
+# characters, so the code fits the smallest QR version, and parse_qr_data can tell
+# a genuine code from a forged one without looking anything up.
+QR_PAYLOAD_VERSION = 1
+QR_ENTITY_TYPES = {"household": 1, "worker": 2}
+QR_SIGNATURE_BYTES = 8
+QR_SIGNING_KEY = os.environ.get("QR_SIGNING_KEY", "")
+QR_SIGNING_KEY_PATH = os.environ.get("QR_SIGNING_KEY_PATH", os.path.join("data", "qr_signing.key"))
+COMPACT_PAYLOAD = re.compile(r"^[A-Z2-7]{16,}$")
+
+_signing_key = None
+_signing_key_lock = threading.Lock()
+
+# Rendered QR codes are kept as PNG bytes, up to QR_CACHE_SIZE of them, so showing
+# or downloading a code again skips building the QR matrix and encoding the PNG
+QR_CACHE_SIZE = int(os.environ.get("QR_CACHE_SIZE", "1024"))
+
+
+class QRCache:
+    """LRU cache of QR PNG bytes by entity, valid while the payload encoded in them matches"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, payload):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != payload:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, payload, png):
+        with self.lock:
+            self.entries[key] = (payload, png)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self.entries),
+            }
+
+
+qr_cache = QRCache(QR_CACHE_SIZE)
 
 
 def generate_qr_code(data, size=10, border=4):
@@ -37,59 +112,141 @@ def qr_to_base64(qr_img):
         return None
 
 
-def create_household_qr(family_id, family_name, address):
-    """Create QR code for household with embedded information"""
-    qr_data = {
-        "type": "household",
-        "family_id": family_id,
-        "family_name": family_name,
-        "address": address,
-        "generated_at": str(pd.Timestamp.now())
-    }
-
-    # Convert to JSON string for QR code
-    import json
-    qr_string = json.dumps(qr_data)
+def qr_to_png(qr_img):
+    """Encode a QR code image as PNG bytes"""
+    buffer = BytesIO()
+    qr_img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def get_signing_key():
+    """Key for QR signatures: QR_SIGNING_KEY, else a random key kept in QR_SIGNING_KEY_PATH"""
+    global _signing_key
+    if _signing_key is None:
+        with _signing_key_lock:
+            if _signing_key is None:
+                if QR_SIGNING_KEY:
+                    _signing_key = QR_SIGNING_KEY.encode()
+                else:
+                    if not os.path.exists(QR_SIGNING_KEY_PATH):
+                        key_dir = os.path.dirname(QR_SIGNING_KEY_PATH)
+                        if key_dir and not os.path.exists(key_dir):
+                            os.makedirs(key_dir)
+                        try:
+                            fd = os.open(QR_SIGNING_KEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                            with os.fdopen(fd, 'wb') as f:
+                                f.write(secrets.token_bytes(32))
+                        except FileExistsError:
+                            # Another process created it first
+                            pass
+                    with open(QR_SIGNING_KEY_PATH, 'rb') as f:
+                        _signing_key = f.read()
+    return _signing_key
+
+
+def qr_signature(body):
+    return hmac.new(get_signing_key(), body, hashlib.sha256).digest()[:QR_SIGNATURE_BYTES]
+
+
+def encode_qr_payload(entity_type, entity_id):
+    """Compact signed payload for a household or worker QR code"""
+    body = bytearray([QR_PAYLOAD_VERSION << 4 | QR_ENTITY_TYPES[entity_type]])
+    value = int(entity_id)
+    while True:
+        # Unsigned LEB128 varint: ids below 2 million take three bytes
+        byte = value & 0x7F
+        value >>= 7
+        body.append(byte | 0x80 if value else byte)
+        if not value:
+            break
+    return base64.b32encode(bytes(body) + qr_signature(bytes(body))).decode().rstrip("=")
+
+
+def decode_qr_payload(qr_string):
+    """Return (entity type, id) of a compact payload; raises ValueError if it is malformed or forged"""
+    data = base64.b32decode(qr_string + "=" * (-len(qr_string) % 8))
+    if base64.b32encode(data).decode().rstrip("=") != qr_string:
+        # Stray bits in the last character would let one payload take several forms
+        raise ValueError("Malformed QR payload")
+    body, signature = data[:-QR_SIGNATURE_BYTES], data[-QR_SIGNATURE_BYTES:]
+    if len(body) < 2 or body[0] >> 4 != QR_PAYLOAD_VERSION:
+        raise ValueError("Unsupported QR payload version")
+    if not hmac.compare_digest(signature, qr_signature(body)):
+        raise ValueError("QR code signature does not match")
+
+    entity_types = {code: name for name, code in QR_ENTITY_TYPES.items()}
+    if body[0] & 0x0F not in entity_types:
+        raise ValueError("Unknown QR entity type")
+    entity_id = 0
+    for shift, byte in enumerate(body[1:]):
+        entity_id |= (byte & 0x7F) << (7 * shift)
+    return entity_types[body[0] & 0x0F], entity_id
+
+
+def cached_qr(key, qr_string):
+    """PNG bytes of the QR code for an entity, rendered only on a cache miss"""
+    png = qr_cache.get(key, qr_string)
+    if png is None:
+        qr_img = generate_qr_code(qr_string)
+        if qr_img is None:
+            return None
+        png = qr_to_png(qr_img)
+        qr_cache.put(key, qr_string, png)
+    return png
+
+
+def invalidate_qr(entity_type, entity_id):
+    """Drop the cached QR code of a household or worker, e.g. after its details change"""
+    qr_cache.invalidate((entity_type, entity_id))
 
-    return generate_qr_code(qr_string)
 
+def create_household_qr(family_id, family_name, address):
+    """Create QR code for household, as PNG bytes
 
-def create_worker_qr(worker_id, worker_name):
-    """Create QR code for waste worker"""
-    qr_data = {
-        "type": "worker",
-        "worker_id": worker_id,
-        "worker_name": worker_name,
-        "generated_at": str(pd.Timestamp.now())
-    }
+    The code carries only the signed family id; scanners look up the name and
+    address by id, so they never go stale on the printed sticker.
+    """
+    return cached_qr(("household", family_id), encode_qr_payload("household", family_id))
 
-    import json
-    qr_string = json.dumps(qr_data)
 
-    return generate_qr_code(qr_string)
+def create_worker_qr(worker_id, worker_name):
+    """Create QR code for waste worker, as PNG bytes"""
+    return cached_qr(("worker", worker_id), encode_qr_payload("worker", worker_id))
 
 
 def parse_qr_data(qr_string):
-    """Parse QR code data back to dictionary"""
+    """Parse QR code data back to dictionary
+
+    Compact payloads are checked against their signature and give the type, the
+    id ('family_id' or 'worker_id') and verified True; forged or damaged ones
+    give type 'invalid'. Older JSON codes are returned as they are, with
+    verified False.
+    """
+    qr_string = (qr_string or "").strip()
+    if COMPACT_PAYLOAD.match(qr_string):
+        try:
+            entity_type, entity_id = decode_qr_payload(qr_string)
+        except (ValueError, binascii.Error) as e:
+            return {"type": "invalid", "data": qr_string, "error": str(e)}
+        id_field = "family_id" if entity_type == "household" else "worker_id"
+        return {"type": entity_type, id_field: entity_id, "verified": True}
+
     try:
         import json
-        return json.loads(qr_string)
+        return {**json.loads(qr_string), "verified": False}
     except:
         return {"type": "unknown", "data": qr_string}
 
 
 def display_qr_code(qr_img, title="QR Code"):
-    """Display QR code in Streamlit"""
+    """Display QR code in Streamlit, given as PNG bytes or an image"""
     if qr_img:
-        st.image(qr_img, caption=title, width=300)
-
-        # Convert to downloadable format
-        buffer = BytesIO()
-        qr_img.save(buffer, format="PNG")
+        png = qr_img if isinstance(qr_img, bytes) else qr_to_png(qr_img)
+        st.image(png, caption=title, width=300)
 
         st.download_button(
             label="📥 Download QR Code",
-            data=buffer.getvalue(),
+            data=png,
             file_name=f"{title.lower().replace(' ', '_')}.png",
             mime="image/png"
         )
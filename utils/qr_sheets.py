@@ -0,0 +1,301 @@
+import argparse
+import os
+import zlib
+from io import BytesIO
+
+from utils.process_pool import process_pool
+
+# Printable sheets of QR stickers for households and QR ID cards for workers.
+# Codes are rendered across CPU cores by a process pool and laid out on A4 pages,
+# which are written to disk one batch at a time, so memory stays flat however many
+# codes are printed.
+#
+#   python -m utils.qr_sheets households --area Koramangala --not-generated --output ward.pdf
+
+QR_SHEET_WORKERS = int(os.environ.get("QR_SHEET_WORKERS", str(os.cpu_count() or 1)))
+
+# A4 at 150 dpi
+PAGE_SIZE = (1240, 1754)
+PAGE_MARGIN = 60
+PAGE_DPI = 150
+LABEL_HEIGHT = 70
+
+
+class PdfSheetWriter:
+    """Writes black and white page images straight into a PDF, one page at a time
+
+    Each page is written out as soon as it is added; only the object offsets
+    are kept, and the page tree and cross-reference table are written once on
+    close(). Pillow's append mode instead re-reads and rewrites the file for
+    every page.
+    """
+
+    def __init__(self, path, dpi=PAGE_DPI):
+        self.file = open(path, 'wb')
+        self.dpi = dpi
+        self.offsets = {}
+        self.page_objects = []
+        # Objects 1 and 2 are the catalog and page tree, written last
+        self.next_object = 3
+        self.file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write_object(self, body, stream=None):
+        number = self.next_object
+        self.next_object += 1
+        self._write_numbered(number, body, stream)
+        return number
+
+    def _write_numbered(self, number, body, stream=None):
+        self.offsets[number] = self.file.tell()
+        self.file.write(f"{number} 0 obj\n".encode() + body)
+        if stream is not None:
+            self.file.write(b"\nstream\n" + stream + b"\nendstream")
+        self.file.write(b"\nendobj\n")
+
+    def add_page(self, image):
+        """Add a page showing image, converted to 1-bit and Flate-compressed"""
+        from PIL import Image
+
+        if image.mode != '1':
+            image = image.convert('1', dither=Image.Dither.NONE)
+        width, height = image.size
+        points = (width * 72 / self.dpi, height * 72 / self.dpi)
+
+        data = zlib.compress(image.tobytes())
+        picture = self._write_object(
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceGray "
+            f"/BitsPerComponent 1 /Filter /FlateDecode /Length {len(data)} >>".encode(), data)
+        drawing = f"q {points[0]:.2f} 0 0 {points[1]:.2f} 0 0 cm /Im0 Do Q".encode()
+        contents = self._write_object(f"<< /Length {len(drawing)} >>".encode(), drawing)
+        self.page_objects.append(self._write_object(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {points[0]:.2f} {points[1]:.2f}] "
+            f"/Resources << /XObject << /Im0 {picture} 0 R >> >> /Contents {contents} 0 R >>".encode()))
+
+    def close(self):
+        kids = " ".join(f"{number} 0 R" for number in self.page_objects)
+        self._write_numbered(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_objects)} >>".encode())
+        self._write_numbered(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref = self.file.tell()
+        self.file.write(f"xref\n0 {self.next_object}\n0000000000 65535 f \n".encode())
+        for number in range(1, self.next_object):
+            self.file.write(f"{self.offsets[number]:010d} 00000 n \n".encode())
+        self.file.write(f"trailer\n<< /Size {self.next_object} /Root 1 0 R >>\n"
+                        f"startxref\n{xref}\n%%EOF\n".encode())
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def render_tile(job):
+    """Render one sticker: the QR code with its label lines underneath, as PNG bytes
+
+    job is (payload, label lines, tile width, tile height). Runs in the worker
+    processes, so it only needs qrcode and Pillow.
+    """
+    import qrcode
+    from PIL import Image, ImageDraw, ImageFont
+
+    payload, lines, width, height = job
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_L, border=2)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    modules = qr.modules_count + 2 * qr.border
+    qr.box_size = max(1, min(width - 20, height - LABEL_HEIGHT - 20) // modules)
+    code = qr.make_image(fill_color="black", back_color="white").get_image().convert('L')
+
+    tile = Image.new('L', (width, height), 255)
+    tile.paste(code, ((width - code.width) // 2, 10))
+    draw = ImageDraw.Draw(tile)
+    draw.rectangle([0, 0, width - 1, height - 1], outline=200)
+    font = ImageFont.load_default(size=20)
+    top = 10 + code.height + 5
+    for line in lines:
+        text_width = draw.textlength(line, font=font)
+        draw.text(((width - text_width) // 2, top), line, fill=0, font=font)
+        top += 26
+
+    output = BytesIO()
+    tile.save(output, format='PNG')
+    return output.getvalue()
+
+
+def household_sticker(family):
+    """QR payload and label lines for a household sticker"""
+    from utils.qr_generator import encode_qr_payload
+
+    return encode_qr_payload('household', family.get('id')), [family.get('family_name') or 'Unknown',
+                                                              f"Family ID: {family.get('id')}"]
+
+
+def worker_card(worker):
+    """QR payload and label lines for a worker ID card"""
+    from utils.qr_generator import encode_qr_payload
+
+    return encode_qr_payload('worker', worker.get('id')), [worker.get('worker_name') or 'Unknown',
+                                                           f"Worker ID: {worker.get('worker_id_number') or worker.get('id')}"]
+
+
+# Sheet kind -> (table, function giving a record's payload and label lines)
+SHEET_KINDS = {
+    'households': ('families', household_sticker),
+    'workers': ('workers', worker_card),
+}
+
+
+def select_records(kind, area=None, status=None, not_generated=False):
+    """Records to print: those in an area (matched against the address) and status,
+    optionally only those whose QR code was never generated"""
+    from utils.database import get_records
+
+    table_name = SHEET_KINDS[kind][0]
+    records = get_records(table_name, {'status': status} if status else None)
+    if area:
+        records = [r for r in records if area.lower() in (r.get('address') or '').lower()]
+    if not_generated:
+        records = [r for r in records if not r.get('qr_generated')]
+    return sorted(records, key=lambda r: r.get('id', 0))
+
+
+def write_qr_sheets(kind, records, output_path, output_format='pdf', columns=3, rows=4,
+                    workers=None, on_progress=None):
+    """Render QR codes for records and write them as printable pages; returns the page count
+
+    output_format 'pdf' writes one PDF at output_path; 'png' writes
+    sheet_0001.png, sheet_0002.png, ... into the output_path directory.
+    on_progress(done, total) is called after each page.
+    """
+    from PIL import Image
+
+    _, sticker = SHEET_KINDS[kind]
+    per_page = columns * rows
+    tile_width = (PAGE_SIZE[0] - 2 * PAGE_MARGIN) // columns
+    tile_height = (PAGE_SIZE[1] - 2 * PAGE_MARGIN) // rows
+    total_pages = -(-len(records) // per_page)
+    if output_format == 'png' and not os.path.exists(output_path):
+        os.makedirs(output_path)
+    pdf = PdfSheetWriter(output_path) if output_format == 'pdf' else None
+
+    workers = workers or QR_SHEET_WORKERS
+    # Each batch keeps every worker busy for about one page
+    batch_size = per_page * workers
+    pages = 0
+    try:
+        with process_pool(workers) as executor:
+            for start in range(0, len(records), batch_size):
+                jobs = [(*sticker(record), tile_width, tile_height) for record in records[start:start + batch_size]]
+                tiles = list(executor.map(render_tile, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+                for page_start in range(0, len(tiles), per_page):
+                    page = Image.new('L', PAGE_SIZE, 255)
+                    for position, tile in enumerate(tiles[page_start:page_start + per_page]):
+                        row, column = divmod(position, columns)
+                        page.paste(Image.open(BytesIO(tile)),
+                                   (PAGE_MARGIN + column * tile_width, PAGE_MARGIN + row * tile_height))
+
+                    if pdf:
+                        pdf.add_page(page)
+                    else:
+                        page.save(os.path.join(output_path, f"sheet_{pages + 1:04d}.png"), format='PNG', optimize=True)
+                    pages += 1
+                    if on_progress:
+                        on_progress(pages, total_pages)
+    finally:
+        if pdf:
+            pdf.close()
+
+    return pages
+
+
+def mark_generated(kind, records):
+    """Set qr_generated on printed records"""
+    from utils.database import update_record, batch_writes
+
+    table_name = SHEET_KINDS[kind][0]
+    with batch_writes():
+        for record in records:
+            if not record.get('qr_generated'):
+                update_record(table_name, record['id'], {'qr_generated': True})
+
+
+def qr_sheet_builder(kind, statuses):
+    """Streamlit form for printing a filtered set of QR sheets, with a download of the result"""
+    import shutil
+    import tempfile
+    import streamlit as st
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        area = st.text_input("Ward / Area", key=f"{kind}_sheet_area", placeholder="Matched against the address")
+    with col2:
+        status = st.selectbox("Status", ["All"] + statuses, key=f"{kind}_sheet_status")
+    with col3:
+        output_format = st.selectbox("Format", ["pdf", "png"], key=f"{kind}_sheet_format",
+                                     format_func=lambda f: "PDF" if f == "pdf" else "PNG sheets (zip)")
+    with col4:
+        not_generated = st.checkbox("Not yet generated only", key=f"{kind}_sheet_new")
+
+    if st.button("🖨️ Build Printable Sheets", key=f"{kind}_sheet_build"):
+        records = select_records(kind, area, None if status == "All" else status, not_generated)
+        if not records:
+            st.info("No records match these filters.")
+            return
+
+        progress = st.progress(0.0, text=f"Rendering {len(records)} QR codes...")
+        # The sheets are built in a scratch directory that is removed afterwards;
+        # only the finished file is kept, in memory, for the download button
+        with tempfile.TemporaryDirectory(prefix="qr_sheets_") as work_dir:
+            output_path = os.path.join(work_dir, f"{kind}_qr.pdf" if output_format == 'pdf' else f"{kind}_qr")
+            try:
+                pages = write_qr_sheets(kind, records, output_path, output_format,
+                                        on_progress=lambda done, total: progress.progress(done / total))
+                if output_format == 'png':
+                    output_path = shutil.make_archive(output_path, 'zip', output_path)
+                with open(output_path, 'rb') as f:
+                    sheet_data = f.read()
+                mark_generated(kind, records)
+            except Exception as e:
+                st.error(f"Error building QR sheets: {str(e)}")
+                return
+
+        st.session_state[f"{kind}_sheet_file"] = (os.path.basename(output_path), sheet_data)
+        st.success(f"✅ {len(records)} QR codes on {pages} pages")
+
+    sheet_file = st.session_state.get(f"{kind}_sheet_file")
+    if sheet_file:
+        file_name, sheet_data = sheet_file
+        st.download_button("📥 Download Sheets", data=sheet_data, file_name=file_name,
+                           mime="application/pdf" if file_name.endswith('.pdf') else "application/zip",
+                           key=f"{kind}_sheet_download")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print QR sheets for households or worker ID cards")
+    parser.add_argument("kind", choices=sorted(SHEET_KINDS))
+    parser.add_argument("--area", help="Only records whose address contains this ward or area")
+    parser.add_argument("--status", help="Only records with this status")
+    parser.add_argument("--not-generated", action="store_true", help="Only records without a QR code yet")
+    parser.add_argument("--output", required=True, help="PDF file, or directory for PNG sheets")
+    parser.add_argument("--format", default="pdf", choices=["pdf", "png"])
+    parser.add_argument("--columns", type=int, default=3)
+    parser.add_argument("--rows", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=QR_SHEET_WORKERS)
+    args = parser.parse_args()
+
+    from utils.database import init_database, get_storage
+    init_database(prefetch=False)
+
+    records = select_records(args.kind, args.area, args.status, args.not_generated)
+    pages = write_qr_sheets(args.kind, records, args.output, args.format, args.columns, args.rows, args.workers,
+                            lambda done, total: print(f"\rPage {done}/{total}", end="", flush=True))
+    mark_generated(args.kind, records)
+    get_storage().flush()
+    print(f"\n{len(records)} codes on {pages} pages written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+from datetime import date
+
+
+# Filter predicates for get_records. A filter value that is not a Predicate
+# keeps the original meaning: the record must have the key and equal the value.
+
+
+class Predicate:
+    """Base class for filter values that match more than one exact value"""
+
+    def matches(self, record, key):
+        raise NotImplementedError
+
+
+class Between(Predicate):
+    """low <= record[key] <= high; either bound may be None for an open range"""
+
+    def __init__(self, low=None, high=None):
+        self.low = low
+        self.high = high
+
+    @classmethod
+    def dates(cls, start, end):
+        """Match ISO timestamps ('created_at') falling on any day from start to end inclusive"""
+        low = start.isoformat() if isinstance(start, date) else start
+        high = end.isoformat() if isinstance(end, date) else end
+        # 'T' sorts after every date character, so the bound covers all of the end day
+        return cls(low, high + "T~" if high is not None else None)
+
+    def contains(self, value):
+        try:
+            if self.low is not None and value < self.low:
+                return False
+            if self.high is not None and value > self.high:
+                return False
+        except TypeError:
+            return False
+        return True
+
+    def matches(self, record, key):
+        return key in record and record[key] is not None and self.contains(record[key])
+
+
+class In(Predicate):
+    """record[key] is one of values"""
+
+    def __init__(self, values):
+        self.values = list(values)
+
+    def matches(self, record, key):
+        if key not in record:
+            return False
+        try:
+            return record[key] in self.values
+        except TypeError:
+            return False
+
+
+class Prefix(Predicate):
+    """record[key] is a string starting with prefix"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def matches(self, record, key):
+        value = record.get(key)
+        return isinstance(value, str) and value.startswith(self.prefix)
+
+
+class Not(Predicate):
+    """Negates a value or predicate; records without the key match"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def matches(self, record, key):
+        return not matches_value(record, key, self.value)
+
+
+def matches_value(record, key, value):
+    """Check one filter entry against a record"""
+    if isinstance(value, Predicate):
+        return value.matches(record, key)
+    return key in record and record[key] == value
+
+
+def matches_filters(record, filters):
+    """Check every filter entry against a record"""
+    for key, value in filters.items():
+        if not matches_value(record, key, value):
+            return False
+    return True
@@ -0,0 +1,134 @@
+import random
+import threading
+import time
+
+
+# Client-side protection for a rate-limited API: a token bucket that backs off when
+# the server pushes back, jittered exponential backoff delays, and a circuit breaker
+# that stops calls while the API keeps failing.
+
+
+class TokenBucket:
+    """Token bucket allowing rate_per_minute calls with bursts of up to burst
+
+    The refill rate adapts: throttle() halves it when the server reports quota
+    errors, and each recover() wins back a twentieth of the configured rate, so
+    the caller settles just under the quota the server actually enforces.
+    """
+
+    def __init__(self, rate_per_minute, burst=1, min_rate_per_minute=1):
+        self.max_rate = rate_per_minute / 60.0
+        self.min_rate = min(min_rate_per_minute, rate_per_minute) / 60.0
+        self.rate = self.max_rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, timeout=None):
+        """Take one token, waiting for it up to timeout seconds; returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def throttle(self):
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def recover(self):
+        with self.lock:
+            if self.rate < self.max_rate:
+                self._refill(time.monotonic())
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    @property
+    def rate_per_minute(self):
+        return self.rate * 60
+
+
+def backoff_delay(attempt, base=1.0, cap=30.0):
+    """Full-jitter exponential backoff: a random delay up to base * 2**attempt, capped"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Fails fast after failure_threshold consecutive failures
+
+    While open, allow() returns False until reset_timeout seconds have passed;
+    then a single trial call is let through (half-open), and its outcome closes
+    the breaker again or reopens it.
+    """
+
+    # Seconds that calls refused while the half-open trial runs are told to wait
+    trial_wait = 1.0
+
+    def __init__(self, failure_threshold=5, reset_timeout=60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def rejecting(self):
+        """True while allow() would refuse a call; unlike allow() it never claims the trial"""
+        with self.lock:
+            state = self.state
+            return state == 'open' or (state == 'half-open' and self.trial_running)
+
+    def cancel(self):
+        """Give back the half-open trial that allow() granted when the call is not made after all"""
+        with self.lock:
+            self.trial_running = False
+
+    def retry_after(self):
+        """Seconds until the breaker lets a call through again; always positive once it opened"""
+        with self.lock:
+            if self.opened_at is None:
+                return 0.0
+            return max(self.trial_wait, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
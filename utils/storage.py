@@ -0,0 +1,426 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+
+# Storage engines behind utils.database. Every engine exposes the same small
+# interface: load/save a whole table, hand out the id for a new record with
+# next_id(table_name, records), and persist a batch of inserts and updates with
+# write_batch(table_name, ops, data). Each op is ('insert', record) or
+# ('update', record, changes), where record is the full record after the write.
+
+# Foreign keys that get an index for point lookups, on top of the primary key 'id'
+INDEXED_FIELDS = ['family_id', 'worker_id', 'vehicle_id', 'collection_record_id']
+
+
+class JsonStorage:
+    """One JSON file per table, rewritten on every write"""
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+
+    def snapshot_path(self, table_name):
+        return os.path.join(self.data_dir, f"{table_name}.json")
+
+    def legacy_path(self, table_name):
+        # 'training_records.json' was historically stored as data/training_records.json
+        if table_name.endswith('.json'):
+            return os.path.join(self.data_dir, table_name)
+        return None
+
+    def next_id(self, table_name, records):
+        """Id for a new record: one past the table's length in this process"""
+        return len(records) + 1
+
+    def load(self, table_name):
+        """Load a table from its JSON snapshot"""
+        for path in (self.snapshot_path(table_name), self.legacy_path(table_name)):
+            if path and os.path.exists(path):
+                with open(path, 'r') as f:
+                    return json.load(f)
+        return []
+
+    # write_batch needs a copy of the whole table, not just the changed records
+    FULL_REWRITE = True
+
+    def save(self, table_name, data):
+        """Atomically replace the table's JSON snapshot"""
+        file_path = self.snapshot_path(table_name)
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+
+    def write_batch(self, table_name, ops, data):
+        self.save(table_name, data)
+
+
+class JsonLogStorage(JsonStorage):
+    """JSON snapshot plus an append-only JSONL log of inserts and updates"""
+
+    FULL_REWRITE = False
+
+    def __init__(self, data_dir, compact_threshold=5000):
+        super().__init__(data_dir)
+        self.compact_threshold = compact_threshold
+
+    def log_path(self, table_name):
+        return os.path.join(self.data_dir, f"{table_name}.jsonl")
+
+    def load(self, table_name):
+        """Load the snapshot and replay the log on top of it"""
+        data = super().load(table_name)
+        if self.replay_log(table_name, data) > self.compact_threshold:
+            self.save(table_name, data)
+        return data
+
+    def replay_log(self, table_name, data):
+        """Apply logged inserts and updates to data in place, return the number of entries applied"""
+        log_path = self.log_path(table_name)
+        if not os.path.exists(log_path):
+            return 0
+
+        by_id = {record.get('id'): record for record in data}
+        applied = 0
+
+        with open(log_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn line from an interrupted append
+                    continue
+
+                if entry.get('op') == 'insert':
+                    record = entry['record']
+                    # Inserts are idempotent so a log that survived a compaction is harmless
+                    if record.get('id') in by_id:
+                        by_id[record['id']].update(record)
+                    else:
+                        data.append(record)
+                        by_id[record.get('id')] = record
+                elif entry.get('op') == 'update':
+                    record = by_id.get(entry.get('id'))
+                    if record is not None:
+                        record.update(entry['changes'])
+                applied += 1
+
+        return applied
+
+    def append_log(self, table_name, entries):
+        """Append insert/update entries to the table's log"""
+        lines = "".join(json.dumps(entry, default=str) + "\n" for entry in entries)
+        with open(self.log_path(table_name), 'a') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def save(self, table_name, data):
+        """Write data as the table's snapshot and truncate its log"""
+        super().save(table_name, data)
+        log_path = self.log_path(table_name)
+        if os.path.exists(log_path):
+            os.remove(log_path)
+
+    def write_batch(self, table_name, ops, data):
+        entries = []
+        for op in ops:
+            if op[0] == 'insert':
+                entries.append({'op': 'insert', 'record': op[1]})
+            else:
+                entries.append({'op': 'update', 'id': op[1].get('id'), 'changes': op[2]})
+        self.append_log(table_name, entries)
+
+
+class ThreadLocalConnection:
+    """Mixin giving each thread its own connection to the SQLite database at db_path
+
+    SQLite connections cannot be shared between threads, so the class using it
+    sets self.db_path and self._local = threading.local() in __init__.
+    """
+
+    def connection(self):
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+class SqliteStorage(ThreadLocalConnection):
+    """All tables in one embedded SQLite database running in WAL mode
+
+    Several server processes can share the database: ids are handed out by
+    SQLite, inserts never overwrite an existing record, and updates only touch
+    the fields they change.
+    """
+
+    FULL_REWRITE = False
+
+    def __init__(self, db_path, data_dir):
+        self.db_path = db_path
+        self.data_dir = data_dir
+        self._local = threading.local()
+        self._init_schema()
+
+    def _init_schema(self):
+        conn = self.connection()
+        with conn:
+            # Table names are stored as values so odd names like 'training_records.json' need no quoting
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS records (
+                    tbl TEXT NOT NULL,
+                    id INTEGER NOT NULL,
+                    created_at TEXT,
+                    doc TEXT NOT NULL,
+                    PRIMARY KEY (tbl, id)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_records_created ON records (tbl, created_at)")
+            for field in INDEXED_FIELDS:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_records_{field} "
+                             f"ON records (tbl, json_extract(doc, '$.{field}'))")
+            # Highest id handed out per table
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sequences (
+                    tbl TEXT PRIMARY KEY,
+                    last_id INTEGER NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS migrations (
+                    tbl TEXT PRIMARY KEY,
+                    migrated_at TEXT NOT NULL
+                )
+            """)
+
+    def _is_migrated(self, table_name):
+        row = self.connection().execute("SELECT 1 FROM migrations WHERE tbl = ?", (table_name,)).fetchone()
+        return row is not None
+
+    def migrate_json(self, table_name):
+        """Import a table from its data/*.json snapshot and log, once"""
+        if self._is_migrated(table_name):
+            return 0
+
+        data = JsonLogStorage(self.data_dir).load(table_name)
+        conn = self.connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO records (tbl, id, created_at, doc) VALUES (?, ?, ?, ?)",
+                [self._row(table_name, record) for record in data]
+            )
+            conn.execute("INSERT OR REPLACE INTO migrations (tbl, migrated_at) VALUES (?, ?)",
+                         (table_name, datetime.now().isoformat()))
+        return len(data)
+
+    def _row(self, table_name, record):
+        return (table_name, record.get('id'), record.get('created_at'), json.dumps(record, default=str))
+
+    def load(self, table_name):
+        """Load a table in insertion order, migrating it from JSON on first access"""
+        self.migrate_json(table_name)
+        rows = self.connection().execute(
+            "SELECT doc FROM records WHERE tbl = ? ORDER BY id", (table_name,)
+        ).fetchall()
+        return [json.loads(doc) for (doc,) in rows]
+
+    def next_id(self, table_name, records):
+        """Reserve the next id for table_name in its own transaction
+
+        The counter never falls behind the highest stored id, so ids stay unique
+        across processes and after save() or a migration wrote ids of its own.
+        """
+        conn = self.connection()
+        with conn:
+            (record_id,) = conn.execute(
+                "INSERT INTO sequences (tbl, last_id) "
+                "SELECT ?, COALESCE(MAX(id), 0) + 1 FROM records WHERE tbl = ? AND true "
+                "ON CONFLICT (tbl) DO UPDATE SET last_id = MAX(last_id + 1, excluded.last_id) "
+                "RETURNING last_id",
+                (table_name, table_name)
+            ).fetchone()
+        return record_id
+
+    def save(self, table_name, data):
+        """Replace the whole table in one transaction"""
+        conn = self.connection()
+        with conn:
+            conn.execute("DELETE FROM records WHERE tbl = ?", (table_name,))
+            conn.executemany(
+                "INSERT INTO records (tbl, id, created_at, doc) VALUES (?, ?, ?, ?)",
+                [self._row(table_name, record) for record in data]
+            )
+            # The table now holds authoritative data, so never import the JSON files over it
+            conn.execute("INSERT OR IGNORE INTO migrations (tbl, migrated_at) VALUES (?, ?)",
+                         (table_name, datetime.now().isoformat()))
+
+    def write_batch(self, table_name, ops, data):
+        """Write every op, in order, in one transaction
+
+        Updates set only their changed fields inside the stored document, so
+        concurrent updates to other fields of the same record are kept.
+        """
+        conn = self.connection()
+        with conn:
+            for op in ops:
+                if op[0] == 'insert':
+                    conn.execute("INSERT INTO records (tbl, id, created_at, doc) VALUES (?, ?, ?, ?)",
+                                 self._row(table_name, op[1]))
+                    continue
+
+                changes = op[2]
+                # json_set rather than json_patch, which would drop fields set to None
+                paths = ", ".join(f"'$.\"{field}\"', json(?)" for field in changes)
+                values = [json.dumps(value, default=str) for value in changes.values()]
+                sql = f"UPDATE records SET doc = json_set(doc, {paths})"
+                if 'created_at' in changes:
+                    sql += ", created_at = ?"
+                    values.append(changes['created_at'])
+                conn.execute(sql + " WHERE tbl = ? AND id = ?", values + [table_name, op[1].get('id')])
+
+
+class WriteBehind:
+    """Write-behind layer that coalesces writes and flushes them in batches
+
+    Durability modes:
+    - "sync": every write goes straight to the engine before returning
+    - "group": writes are queued and the writer waits until a background flush,
+      shared with every other write that arrived within the window, is on disk
+    - "async": writes are queued and flushed within the window; the writer does
+      not wait, so a crash can lose the last window of writes
+
+    snapshot(table_name) must return a copy of the whole table and is only
+    needed for engines that rewrite the full table (FULL_REWRITE).
+    """
+
+    def __init__(self, engine, mode="group", window=0.02, snapshot=None):
+        if mode not in ("sync", "group", "async"):
+            raise ValueError(f"Unknown durability mode: {mode}")
+        self.engine = engine
+        self.mode = mode
+        self.window = window
+        self.snapshot = snapshot
+        self.pending = []
+        self.waiters = []
+        self.cond = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.last_error = None
+        self.flushes = 0
+        self.flushed_ops = 0
+        self.thread = None
+        if mode != "sync":
+            self.thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self.thread.start()
+            atexit.register(self.flush)
+
+    def load(self, table_name):
+        return self.engine.load(table_name)
+
+    def save(self, table_name, data):
+        """Replace a whole table right away, ahead of any queued writes
+
+        Callers flush() first so queued writes land before it. That cannot happen
+        in here: save_data holds the store lock, which the flusher may need to
+        snapshot a table.
+        """
+        self.engine.save(table_name, data)
+
+    def next_id(self, table_name, records):
+        return self.engine.next_id(table_name, records)
+
+    def insert(self, table_name, record, data):
+        """Persist or queue an insert; call this with the store lock held"""
+        return self._write(table_name, ('insert', dict(record)), data)
+
+    def update(self, table_name, record, changes, data):
+        """Persist or queue an update; call this with the store lock held"""
+        return self._write(table_name, ('update', dict(record), dict(changes)), data)
+
+    def _write(self, table_name, op, data):
+        if self.mode == "sync":
+            self.engine.write_batch(table_name, [op], data)
+            return None
+
+        ticket = threading.Event() if self.mode == "group" else None
+        with self.cond:
+            self.pending.append((table_name, op))
+            if ticket is not None:
+                self.waiters.append(ticket)
+            self.cond.notify()
+        return ticket
+
+    def wait(self, ticket):
+        """Block until the flush holding this write finished; re-raise its error"""
+        if ticket is None:
+            return
+        ticket.wait()
+        if getattr(ticket, 'error', None) is not None:
+            raise ticket.error
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+            # Give concurrent writers the rest of the window to join this batch
+            time.sleep(self.window)
+            self.flush()
+            if self.last_error is not None:
+                # Back off instead of spinning on a failing disk or database
+                time.sleep(1.0)
+
+    def flush(self):
+        """Write every queued op to the engine, one batch per table"""
+        with self.flush_lock:
+            with self.cond:
+                pending, self.pending = self.pending, []
+                waiters, self.waiters = self.waiters, []
+            if not pending:
+                return
+
+            by_table = {}
+            for table_name, op in pending:
+                by_table.setdefault(table_name, []).append(op)
+
+            error = None
+            for table_name, ops in by_table.items():
+                try:
+                    data = self.snapshot(table_name) if self.engine.FULL_REWRITE else None
+                    self.engine.write_batch(table_name, ops, data)
+                    self.flushed_ops += len(ops)
+                except Exception as e:
+                    error = e
+                    if self.mode == "async":
+                        # Nobody is waiting on these, so keep them for the next flush
+                        with self.cond:
+                            self.pending[:0] = [(table_name, op) for op in ops]
+
+            self.flushes += 1
+            self.last_error = error
+            for ticket in waiters:
+                ticket.error = error
+                ticket.set()
+
+
+def create_storage(backend, data_dir, compact_threshold=5000):
+    """Build the storage engine named by backend ('json', 'jsonl' or 'sqlite')"""
+    if backend == 'json':
+        return JsonStorage(data_dir)
+    if backend == 'jsonl':
+        return JsonLogStorage(data_dir, compact_threshold)
+    if backend == 'sqlite':
+        return SqliteStorage(os.path.join(data_dir, "ecowork.db"), data_dir)
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,508 @@
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from utils.storage import create_storage
+
+# Synthetic city generator. Records use the same shapes the pages write, with ids
+# assigned in created_at order like add_record does, so every page, analytics view
+# and the benchmark suite can run against realistic volume.
+#
+#   python -m utils.synthetic_data --families 10000 --days 30 --data-dir data_city
+
+AREAS = ["Sector 1", "Sector 2", "Sector 3", "Sector 4", "Old Town", "Market Road",
+         "Riverside", "Station Area", "Industrial Estate", "Green Park"]
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Ananya", "Diya", "Ishaan", "Kavya", "Meera",
+               "Rohan", "Saanvi", "Arjun", "Priya", "Rahul", "Neha", "Vikram", "Pooja"]
+LAST_NAMES = ["Sharma", "Verma", "Gupta", "Singh", "Patel", "Kumar", "Reddy", "Iyer",
+              "Nair", "Das", "Mehta", "Joshi"]
+WASTE_TYPES = ["Organic Waste", "Recyclable Waste", "Hazardous Waste", "General Waste"]
+
+# (table, field) -> every value the pages write to that field and accept back in
+# their selectboxes and filters. Generated values are drawn from these lists and
+# checked against them by check_page_values.
+PAGE_VALUES = {
+    ('training_records.json', 'training_preference'): ["Workshop (Community Center)", "Online Training",
+                                                       "Home Visit by Trainer"],
+    ('training_records.json', 'status'): ["pending", "scheduled", "completed", "cancelled"],
+    ('families', 'house_type'): ["Apartment", "Independent House", "Villa", "Other"],
+    ('families', 'collection_preference'): ["Morning (6-9 AM)", "Afternoon (12-3 PM)", "Evening (6-8 PM)"],
+    ('families', 'bin_types'): WASTE_TYPES,
+    ('families', 'status'): ["active", "inactive", "suspended"],
+    ('workers', 'job_type'): ["Waste Collector", "Vehicle Driver", "Sorting Facility Worker", "Supervisor",
+                              "Safety Inspector"],
+    ('workers', 'employment_type'): ["Full-time", "Part-time", "Contract", "Temporary"],
+    ('workers', 'shift_preference'): ["Morning (6 AM - 2 PM)", "Afternoon (2 PM - 10 PM)", "Night (10 PM - 6 AM)",
+                                      "Flexible"],
+    ('workers', 'status'): ["registered", "kit_distributed", "training_completed", "active", "inactive"],
+    ('safety_kits', 'kit_condition'): ["New", "Good", "Refurbished"],
+    ('vehicles', 'vehicle_type'): ["Small Truck", "Medium Truck", "Large Truck", "Compactor", "Tipper", "Mini Van"],
+    ('vehicles', 'fuel_type'): ["Diesel", "Petrol", "CNG", "Electric"],
+    ('vehicles', 'operating_hours'): ["6 AM - 2 PM", "2 PM - 10 PM", "6 AM - 6 PM", "24 Hours"],
+    ('vehicles', 'status'): ["active", "inactive", "maintenance", "repair"],
+    ('vehicles', 'current_status'): ["On Route", "At Collection Point", "Heading to Treatment Plant",
+                                     "At Treatment Plant", "Returning to Base", "Break", "Maintenance"],
+    ('collection_routes', 'status'): ["planned", "in_progress", "completed", "cancelled"],
+    ('collections', 'waste_types_collected'): WASTE_TYPES,
+    ('collections', 'segregation_quality'): ["good", "average", "poor"],
+    ('collections', 'quantity_estimate'): ["Small (< 5kg)", "Medium (5-15kg)", "Large (> 15kg)"],
+    ('rewards_fines', 'type'): ["reward", "manual_reward", "community_reward", "incentive", "ai_bonus",
+                                "fine", "warning", "penalty"],
+    ('rewards_fines', 'severity'): ["low", "medium", "high"],
+    ('rewards_fines', 'status'): ["issued", "resolved"],
+    ('rewards_fines', 'payment_status'): ["pending", "paid", "n/a"],
+    ('treatment_reports', 'segregation_quality'): ["excellent", "good", "average", "poor"],
+    ('treatment_reports', 'plant_section'): ["Organic Processing", "Recycling Unit", "Hazardous Treatment",
+                                             "General Disposal", "Sorting Area"],
+    ('community_reports', 'issue_type'): ["Illegal Dumping", "Overflowing Bins", "Littering", "Poor Segregation",
+                                          "Hazardous Waste", "Construction Waste", "Burning of Waste",
+                                          "Blocked Drainage"],
+    ('community_reports', 'severity'): ["low", "medium", "high"],
+    ('community_reports', 'waste_types'): ["Plastic Waste", "Food Waste", "Paper/Cardboard", "Glass", "Metal",
+                                           "Electronic Waste", "Construction Debris", "Medical Waste",
+                                           "Chemical Waste", "Mixed Waste"],
+    ('community_reports', 'estimated_quantity'): ["Small (Few items)", "Medium (Bag-sized)", "Large (Cart-sized)",
+                                                  "Very Large (Truck-sized)"],
+    ('community_reports', 'best_time_to_address'): ["Morning (6-10 AM)", "Afternoon (10 AM-2 PM)",
+                                                    "Evening (2-6 PM)", "Anytime"],
+    ('community_reports', 'status'): ["submitted", "validated", "in_progress", "resolved", "rejected"],
+}
+
+COLLECTION_QUALITY = (PAGE_VALUES['collections', 'segregation_quality'], [0.55, 0.3, 0.15])
+DELIVERY_QUALITY = (PAGE_VALUES['treatment_reports', 'segregation_quality'], [0.2, 0.45, 0.25, 0.1])
+
+
+def check_page_values(tables):
+    """Raise ValueError if a record holds a PAGE_VALUES field value the pages do not accept"""
+    problems = set()
+    for (table_name, field), allowed in PAGE_VALUES.items():
+        for record in tables.get(table_name, []):
+            if field not in record:
+                continue
+            values = record[field] if isinstance(record[field], list) else [record[field]]
+            problems.update((table_name, field, value) for value in values if value not in allowed)
+    if problems:
+        raise ValueError("Values the pages do not accept: " + ", ".join(
+            f"{table_name}.{field}={value!r}" for table_name, field, value in sorted(problems, key=str)))
+
+
+class City:
+    """Builds the tables of one synthetic city"""
+
+    def __init__(self, families=1000, workers=None, vehicles=None, routes=None, days=30,
+                 collection_rate=1 / 3, seed=0, end=None):
+        self.rng = random.Random(seed)
+        self.families = families
+        self.workers = workers if workers is not None else max(5, families // 150)
+        self.vehicles = vehicles if vehicles is not None else max(2, self.workers // 3)
+        self.routes = routes if routes is not None else self.workers * 2
+        self.days = days
+        self.collection_rate = collection_rate
+        self.end = end or datetime.now()
+        self.start = self.end - timedelta(days=days)
+        self.tables = {}
+
+    def pick(self, table_name, field):
+        """A random value the pages accept for a field"""
+        return self.rng.choice(PAGE_VALUES[table_name, field])
+
+    def name(self):
+        return f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}"
+
+    def phone(self):
+        return f"9{self.rng.randrange(10 ** 8, 10 ** 9)}"
+
+    def moment(self, day=None):
+        """A random timestamp on day (0-based from the start), or anywhere in the period"""
+        if day is None:
+            day = self.rng.randrange(self.days)
+        return self.start + timedelta(days=day, seconds=self.rng.randrange(6 * 3600, 20 * 3600))
+
+    def table(self, table_name, records):
+        """Sort records by created_at (or registration_date) and number them like add_record"""
+        records.sort(key=lambda r: r.get('created_at') or r.get('registration_date', ''))
+        for number, record in enumerate(records, 1):
+            record['id'] = number
+            record.setdefault('created_at', record.get('registration_date'))
+        self.tables[table_name] = records
+        return records
+
+    def build(self):
+        """Generate every table; returns {table name: records}"""
+        self.build_training()
+        self.build_families()
+        self.build_workers()
+        self.build_vehicles()
+        self.build_routes()
+        self.build_collections()
+        self.build_treatment_reports()
+        self.build_community_reports()
+        return self.tables
+
+    def build_training(self):
+        records = []
+        for _ in range(self.families):
+            registered = self.start - timedelta(days=self.rng.randrange(30, 365))
+            records.append({
+                'family_name': f"{self.rng.choice(LAST_NAMES)} Family",
+                'head_of_family': self.name(),
+                'contact_number': self.phone(),
+                'email': '',
+                'address': f"{self.rng.randrange(1, 500)}, {self.rng.choice(AREAS)}",
+                'family_size': self.rng.randint(1, 8),
+                'training_preference': self.pick('training_records.json', 'training_preference'),
+                'preferred_date': str(registered.date()),
+                'status': 'completed',
+                'notes': '',
+                'registration_date': registered.isoformat()
+            })
+        self.table('training_records.json', records)
+
+    def build_families(self):
+        records = []
+        for training in self.tables['training_records.json']:
+            registered = datetime.fromisoformat(training['registration_date']) + timedelta(days=7)
+            records.append({
+                'family_name': training['family_name'],
+                'head_of_family': training['head_of_family'],
+                'contact_number': training['contact_number'],
+                'email': training['email'],
+                'address': training['address'],
+                'family_size': training['family_size'],
+                'house_type': self.pick('families', 'house_type'),
+                'collection_preference': self.pick('families', 'collection_preference'),
+                'training_id': str(training['id']),
+                'bin_types': self.rng.sample(WASTE_TYPES[:3], self.rng.randint(2, 3)),
+                'special_requirements': '',
+                'status': 'active',
+                'registration_date': registered.isoformat(),
+                'qr_generated': self.rng.random() < 0.8
+            })
+        self.table('families', records)
+
+    def build_workers(self):
+        workers, kits, trainings = [], [], []
+        for number in range(self.workers):
+            registered = self.start - timedelta(days=self.rng.randrange(30, 720))
+            trained = self.rng.random() < 0.9
+            workers.append({
+                'worker_name': self.name(),
+                'worker_id_number': f"W{number + 1:05d}",
+                'contact_number': self.phone(),
+                'email': '',
+                'date_of_birth': str((registered - timedelta(days=365 * self.rng.randint(20, 55))).date()),
+                'address': f"{self.rng.randrange(1, 500)}, {self.rng.choice(AREAS)}",
+                'job_type': self.pick('workers', 'job_type'),
+                'employment_type': self.pick('workers', 'employment_type'),
+                'supervisor_name': self.name(),
+                'vehicle_assigned': '',
+                'emergency_contact_name': self.name(),
+                'emergency_relationship': "Spouse",
+                'emergency_contact_number': self.phone(),
+                'emergency_address': '',
+                'medical_conditions': '',
+                'medications': '',
+                'shift_preference': self.pick('workers', 'shift_preference'),
+                'status': 'active' if trained else 'registered',
+                'training_completed': trained,
+                'safety_kit_received': trained,
+                'qr_generated': trained,
+                'documents_uploaded': True,
+                'registration_date': registered.isoformat()
+            })
+        self.table('workers', workers)
+
+        for worker in workers:
+            if not worker['training_completed']:
+                continue
+            issued = datetime.fromisoformat(worker['registration_date']) + timedelta(days=3)
+            kits.append({
+                'worker_id': worker['id'],
+                'worker_name': worker['worker_name'],
+                'kit_items': ["Gloves", "Mask", "Reflective Vest", "Boots"],
+                'kit_condition': self.pick('safety_kits', 'kit_condition'),
+                'distributed_by': self.name(),
+                'distribution_date': str(issued.date()),
+                'ai_verification': {'verified': True, 'confidence': 0.9},
+                'created_at': issued.isoformat()
+            })
+            trainings.append({
+                'worker_id': worker['id'],
+                'worker_name': worker['worker_name'],
+                'trainer_name': self.name(),
+                'assessment_score': self.rng.randint(70, 100),
+                'status': 'completed',
+                'created_at': (issued + timedelta(days=1)).isoformat()
+            })
+        self.table('safety_kits', kits)
+        self.table('worker_training', trainings)
+
+    def build_vehicles(self):
+        records = []
+        drivers = [w for w in self.tables['workers'] if w['job_type'] == 'Vehicle Driver'] or self.tables['workers']
+        for number in range(self.vehicles):
+            created = self.start - timedelta(days=self.rng.randrange(30, 720))
+            driver = drivers[number % len(drivers)]
+            records.append({
+                'vehicle_number': f"WM-{number + 1:04d}",
+                'vehicle_type': self.pick('vehicles', 'vehicle_type'),
+                'capacity': float(self.rng.choice([1, 2, 5, 8])),
+                'fuel_type': self.pick('vehicles', 'fuel_type'),
+                'driver_name': driver['worker_name'],
+                'driver_contact': driver['contact_number'],
+                'registration_number': f"KA01AB{number + 1:04d}",
+                'insurance_expiry': str((self.end + timedelta(days=180)).date()),
+                'manufacture_year': self.rng.randint(2012, 2024),
+                'last_service_date': str((self.end - timedelta(days=30)).date()),
+                'next_service_date': str((self.end + timedelta(days=60)).date()),
+                'gps_device_id': f"GPS{number + 1:05d}",
+                'operating_hours': self.pick('vehicles', 'operating_hours'),
+                'base_location': self.rng.choice(AREAS),
+                'notes': '',
+                'status': 'active',
+                'current_status': self.pick('vehicles', 'current_status'),
+                'total_collections': 0,
+                'total_distance': 0.0,
+                'created_at': created.isoformat()
+            })
+        self.table('vehicles', records)
+
+    def build_routes(self):
+        records = []
+        family_ids = [str(f['id']) for f in self.tables['families']]
+        for number in range(self.routes):
+            members = self.rng.sample(family_ids, min(len(family_ids), self.rng.randint(20, 60)))
+            records.append({
+                'route_name': f"Route {number + 1}",
+                'collector_assigned': self.rng.choice(self.tables['workers'])['worker_name'],
+                'vehicle_assigned': self.rng.choice(self.tables['vehicles'])['vehicle_number'],
+                'family_ids': members,
+                'estimated_time': self.rng.choice([2.0, 3.0, 4.0, 5.5]),
+                'route_notes': '',
+                'status': self.pick('collection_routes', 'status'),
+                'families_count': len(members),
+                'created_at': self.moment().isoformat()
+            })
+        self.table('collection_routes', records)
+
+    def build_collections(self):
+        collections, rewards = [], []
+        families = self.tables['families']
+        workers = self.tables['workers']
+        vehicles = self.tables['vehicles']
+        per_day = max(1, int(len(families) * self.collection_rate))
+
+        for day in range(self.days):
+            for family in self.rng.sample(families, per_day):
+                collected = self.moment(day)
+                quality = self.rng.choices(*COLLECTION_QUALITY)[0]
+                collections.append({
+                    'family_id': family['id'],
+                    'family_name': family['family_name'],
+                    'address': family['address'],
+                    'collection_date': str(collected.date()),
+                    'collection_time': collected.time().isoformat(timespec='seconds'),
+                    'collector_name': self.rng.choice(workers)['worker_name'],
+                    'vehicle_number': self.rng.choice(vehicles)['vehicle_number'],
+                    'waste_types_collected': self.rng.sample(WASTE_TYPES[:3], self.rng.randint(1, 3)),
+                    'segregation_quality': quality,
+                    'quantity_estimate': self.pick('collections', 'quantity_estimate'),
+                    'bins_present': True,
+                    'household_cooperative': self.rng.random() < 0.95,
+                    'contamination_issues': [],
+                    'special_items': '',
+                    'missed_collection': False,
+                    'payment_required': False,
+                    'collection_notes': '',
+                    'photos_uploaded': 0,
+                    'created_at': collected.isoformat()
+                })
+        self.table('collections', collections)
+
+        # Rewards and warnings follow each collection, as in the collection page
+        for collection in collections:
+            if collection['segregation_quality'] == 'average':
+                continue
+            good = collection['segregation_quality'] == 'good'
+            rewards.append({
+                'family_id': collection['family_id'],
+                'type': 'reward' if good else 'warning',
+                'reason': 'Proper waste segregation' if good else 'Poor waste segregation',
+                'amount': 10 if good else 0,
+                'collection_record_id': collection['id'],
+                'created_at': collection['created_at']
+            })
+
+        # A few manual fines on top
+        for collection in self.rng.sample(collections, len(collections) // 200):
+            issued = datetime.fromisoformat(collection['created_at']) + timedelta(hours=2)
+            rewards.append({
+                'type': 'fine',
+                'family_id': collection['family_id'],
+                'family_name': collection['family_name'],
+                'reason': 'Repeated poor segregation',
+                'amount': self.rng.choice([100, 250, 500]),
+                'severity': self.pick('rewards_fines', 'severity'),
+                'violation_date': str(issued.date()),
+                'detailed_description': '',
+                'inspector_name': self.name(),
+                'inspector_id': '',
+                'evidence_photo': False,
+                'status': 'issued',
+                'payment_status': self.rng.choice(['pending', 'paid']),
+                'collection_record_id': collection['id'],
+                'created_at': issued.isoformat()
+            })
+        self.tables['rewards_fines'] = rewards
+
+    def build_treatment_reports(self):
+        reports = []
+        for day in range(self.days):
+            for vehicle in self.tables['vehicles']:
+                for _ in range(self.rng.randint(1, 2)):
+                    delivered = self.moment(day)
+                    weights = [round(self.rng.uniform(0, 800), 1) for _ in range(4)]
+                    verified = self.rng.random() < 0.7
+                    report = {
+                        'vehicle_id': vehicle['id'],
+                        'vehicle_number': vehicle['vehicle_number'],
+                        'driver_name': vehicle['driver_name'],
+                        'collection_route': '',
+                        'delivery_date': str(delivered.date()),
+                        'delivery_time': delivered.time().isoformat(timespec='seconds'),
+                        'organic_weight': weights[0],
+                        'recyclable_weight': weights[1],
+                        'hazardous_weight': weights[2],
+                        'general_weight': weights[3],
+                        'total_weight': round(sum(weights), 1),
+                        'segregation_quality': self.rng.choices(*DELIVERY_QUALITY)[0],
+                        'contamination_level': self.rng.randint(0, 40),
+                        'plant_section': self.pick('treatment_reports', 'plant_section'),
+                        'received_by': self.name(),
+                        'delivery_notes': '',
+                        'vehicle_inspected': True,
+                        'documentation_complete': True,
+                        'safety_protocols': True,
+                        'weight_verified': True,
+                        'quality_checked': True,
+                        'receipt_issued': True,
+                        'photos_uploaded': 2,
+                        'ai_verification_pending': not verified,
+                        'status': 'delivered',
+                        'created_at': delivered.isoformat()
+                    }
+                    if verified:
+                        report.update({
+                            'ai_verified': True,
+                            'ai_confidence': round(self.rng.uniform(0.7, 0.99), 2),
+                            'verification_date': (delivered + timedelta(hours=1)).isoformat()
+                        })
+                    reports.append(report)
+        self.table('treatment_reports', reports)
+
+        # Driver incentives for good deliveries
+        for report in reports:
+            if report['segregation_quality'] in ['excellent', 'good']:
+                self.tables['rewards_fines'].append({
+                    'worker_name': report['driver_name'],
+                    'vehicle_number': report['vehicle_number'],
+                    'type': 'incentive',
+                    'reason': f"Quality waste delivery - {report['segregation_quality']} segregation",
+                    'amount': 50 if report['segregation_quality'] == 'excellent' else 25,
+                    'treatment_record_id': report['id'],
+                    'created_at': report['created_at']
+                })
+        self.table('rewards_fines', self.tables['rewards_fines'])
+
+    def build_community_reports(self):
+        records = []
+        for _ in range(max(1, self.families // 20)):
+            status = self.rng.choices(['submitted', 'validated', 'in_progress', 'resolved'],
+                                      [0.4, 0.3, 0.15, 0.15])[0]
+            records.append({
+                'reporter_name': self.name() if self.rng.random() < 0.8 else 'Anonymous',
+                'reporter_contact': self.phone(),
+                'reporter_email': '',
+                'area': self.rng.choice(AREAS),
+                'landmark': '',
+                'pincode': f"560{self.rng.randrange(1, 100):03d}",
+                'latitude': round(12.9 + self.rng.uniform(-0.1, 0.1), 6),
+                'longitude': round(77.6 + self.rng.uniform(-0.1, 0.1), 6),
+                'issue_type': self.pick('community_reports', 'issue_type'),
+                'severity': self.rng.choices(['low', 'medium', 'high'], [0.45, 0.35, 0.2])[0],
+                'waste_types': self.rng.sample(PAGE_VALUES['community_reports', 'waste_types'],
+                                               self.rng.randint(1, 2)),
+                'estimated_quantity': self.pick('community_reports', 'estimated_quantity'),
+                'description': "Waste accumulated near the road",
+                'first_noticed': str(self.moment().date()),
+                'recurring_issue': self.rng.random() < 0.3,
+                'best_time_to_address': self.pick('community_reports', 'best_time_to_address'),
+                'urgency_notes': '',
+                'anonymous': False,
+                'photos_uploaded': 1,
+                'status': status,
+                'upvotes': self.rng.randint(0, 30),
+                'downvotes': self.rng.randint(0, 5),
+                'validation_status': 'validated' if status != 'submitted' else 'pending',
+                'ai_analysis_pending': status == 'submitted',
+                'created_at': self.moment().isoformat()
+            })
+        self.table('community_reports', records)
+
+
+def generate_city(data_dir, backend="jsonl", **scale):
+    """Generate a synthetic city and write it to data_dir with the given storage engine
+
+    Returns {table name: row count}.
+    """
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+    storage = create_storage(backend, data_dir)
+    tables = City(**scale).build()
+    check_page_values(tables)
+    counts = {}
+    for table_name, records in tables.items():
+        storage.save(table_name, records)
+        counts[table_name] = len(records)
+    return counts
+
+
+def scale_for_rows(rows, days=30):
+    """City size whose collections table has about rows records"""
+    collection_rate = 1 / 3
+    return {'families': max(10, int(rows / (days * collection_rate))), 'days': days,
+            'collection_rate': collection_rate}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic city for EcoWork")
+    parser.add_argument("--data-dir", default="data_city", help="Directory to write the tables to")
+    parser.add_argument("--backend", default="jsonl", choices=["json", "jsonl", "sqlite"])
+    parser.add_argument("--rows", type=int, help="Size the city for about this many collection records")
+    parser.add_argument("--families", type=int, default=1000)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--vehicles", type=int)
+    parser.add_argument("--routes", type=int)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--collection-rate", type=float, default=1 / 3,
+                        help="Share of families collected each day")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.rows:
+        scale = scale_for_rows(args.rows, args.days)
+    else:
+        scale = {'families': args.families, 'days': args.days, 'collection_rate': args.collection_rate}
+    scale.update(workers=args.workers, vehicles=args.vehicles, routes=args.routes, seed=args.seed)
+
+    started = time.perf_counter()
+    counts = generate_city(args.data_dir, args.backend, **scale)
+    for table_name, count in counts.items():
+        print(f"{table_name:24} {count:>10,}")
+    print(f"Wrote {sum(counts.values()):,} records to {args.data_dir} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()